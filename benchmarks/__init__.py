@@ -0,0 +1,11 @@
+"""
+Benchmarks for the rate limiting middleware.
+
+The latency benchmarks drive the ASGI application in-process, with no HTTP
+server or sockets, so the numbers measure the middleware and its backend
+alone. The memory benchmark needs a redis-server.
+
+    python -m benchmarks.bench_overhead      middleware plumbing vs. BaseHTTPMiddleware
+    python -m benchmarks.bench_hot_path      latency/throughput matrix, JSON output
+    python -m benchmarks.bench_memory        Redis memory of the key layouts, JSON output
+"""
@@ -0,0 +1,175 @@
+"""
+Latency and throughput of the limiter hot path across a matrix of backends,
+algorithms, allow/deny paths, key cardinalities and concurrency levels.
+
+Each configuration is driven in-process through the real middleware. Latency
+percentiles are per request; "added" latency subtracts the same percentile
+of the bare application run at the same concurrency. Results are written as
+JSON so CI can compare them against a stored baseline:
+
+    python -m benchmarks.bench_hot_path --output results.json
+    python -m benchmarks.bench_hot_path --redis-url redis://localhost:6379/15 \\
+        --backend memory --backend redis
+    python -m benchmarks.bench_hot_path --compare baseline.json --max-regression 0.2
+
+The memory backend needs nothing else. The redis backend needs a running
+redis-server; benchmark keys are namespaced per run and expire on their own,
+so the database is never flushed.
+"""
+from typing import Dict, List
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+from fastapi_redis_rate_limiter import MemoryBackend, RedisBackend, RedisRateLimitMiddleware
+from fastapi_redis_rate_limiter.algorithms import ALGORITHMS
+
+from .harness import drive, endpoint, make_scope, percentiles, quiet_logging
+
+PATHS = ("allow", "deny")
+_ALLOW_LIMIT = 10 ** 9
+
+
+def _backend(name: str, redis_url: str):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        if not redis_url:
+            raise SystemExit("--backend redis needs --redis-url")
+        import redis.asyncio as redis
+
+        return RedisBackend(redis.from_url(redis_url))
+    raise SystemExit(f"Unknown backend {name!r}")
+
+
+def _micros(values: Dict[str, float]) -> Dict[str, float]:
+    return {label: round(value * 1e6, 3) for label, value in values.items()}
+
+
+async def _run(config: dict, requests: int, redis_url: str, run_id: str, baselines: dict) -> dict:
+    concurrency = config["concurrency"]
+    if concurrency not in baselines:
+        baseline_scopes = [make_scope("baseline")]
+        await drive(endpoint, baseline_scopes, requests, concurrency)  # warm-up
+        baselines[concurrency] = percentiles((await drive(endpoint, baseline_scopes, requests, concurrency))["latencies"])
+
+    backend = _backend(config["backend"], redis_url)
+    limit = _ALLOW_LIMIT if config["path"] == "allow" else 1
+    app = RedisRateLimitMiddleware(endpoint, backend=backend, algorithm=config["algorithm"], rate_limit=limit, time_window=60)
+    prefix = f"bench-{run_id}-{config['backend']}-{config['algorithm']}-{config['path']}-{config['cardinality']}-{concurrency}"
+    scopes = [make_scope(f"{prefix}-{i}") for i in range(config["cardinality"])]
+    try:
+        # touches every key once, which also exhausts the quota on the deny path
+        await drive(app, scopes, len(scopes), concurrency)
+        run = await drive(app, scopes, requests, concurrency)
+    finally:
+        await backend.close()
+
+    latency = percentiles(run["latencies"])
+    added = {label: latency[label] - baselines[concurrency][label] for label in latency}
+    return {
+        **config,
+        "requests": requests,
+        "throughput_rps": round(requests / run["elapsed"], 1),
+        "latency_us": _micros(latency),
+        "added_latency_us": _micros(added),
+        "statuses": {str(status): count for status, count in sorted(run["statuses"].items())},
+    }
+
+
+def run_matrix(backends: List[str], algorithms: List[str], paths: List[str], cardinalities: List[int],
+               concurrencies: List[int], requests: int, redis_url: str = None) -> dict:
+    """
+    Runs every combination of the given dimensions and returns the report.
+    """
+    run_id = f"{os.getpid()}-{int(time.time())}"
+    baselines = {}
+    results = []
+
+    async def run_all():
+        for backend, algorithm, path, cardinality, concurrency in itertools.product(backends, algorithms, paths, cardinalities, concurrencies):
+            config = {"backend": backend, "algorithm": algorithm, "path": path, "cardinality": cardinality, "concurrency": concurrency}
+            results.append(await _run(config, requests, redis_url, run_id, baselines))
+
+    asyncio.run(run_all())
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "requests": requests,
+        },
+        "results": results,
+    }
+
+
+def _result_id(result: dict) -> tuple:
+    return tuple(result[field] for field in ("backend", "algorithm", "path", "cardinality", "concurrency"))
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """
+    Lists configurations whose throughput dropped, or whose p99 latency grew,
+    by more than ``max_regression`` (a fraction) against ``baseline``.
+    """
+    previous = {_result_id(result): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(_result_id(result))
+        if old is None:
+            continue
+        label = "/".join(str(part) for part in _result_id(result))
+        if result["throughput_rps"] < old["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{label}: throughput {old['throughput_rps']} -> {result['throughput_rps']} rps")
+        if result["latency_us"]["p99"] > old["latency_us"]["p99"] * (1 + max_regression):
+            regressions.append(f"{label}: p99 {old['latency_us']['p99']} -> {result['latency_us']['p99']} us")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", action="append", choices=("memory", "redis"), help="repeatable; default memory")
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL"))
+    parser.add_argument("--algorithm", action="append", choices=sorted(ALGORITHMS), help="repeatable; default all")
+    parser.add_argument("--path", action="append", choices=PATHS, help="repeatable; default both")
+    parser.add_argument("--cardinality", action="append", type=int, help="distinct clients; default 1 and 10000")
+    parser.add_argument("--concurrency", action="append", type=int, help="concurrent tasks; default 1 and 64")
+    parser.add_argument("--requests", type=int, default=10000, help="measured requests per configuration")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+    quiet_logging()
+
+    report = run_matrix(
+        args.backend or ["memory"],
+        args.algorithm or sorted(ALGORITHMS),
+        args.path or list(PATHS),
+        args.cardinality or [1, 10000],
+        args.concurrency or [1, 64],
+        args.requests,
+        args.redis_url,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Redis memory used by the per-client key layout (FixedWindow) versus the
+compact bucketed layout (CompactFixedWindow).
+
+Every key is written by the real rate limiting script, pipelined, and the
+cost is read from INFO memory. This needs a redis-server and a database it
+may empty: the database must be empty at start (or pass --flush) and is
+flushed between runs.
+
+    python -m benchmarks.bench_memory --redis-url redis://localhost:6379/15
+    python -m benchmarks.bench_memory --keys 1000000 --keys 10000000 --ipv6 --output memory.json
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import sys
+import time
+
+import redis.asyncio as redis
+
+from fastapi_redis_rate_limiter import CompactFixedWindow, FixedWindow
+
+_PIPELINE = 5000
+_WINDOW_MS = 3600 * 1000
+
+
+def _identifiers(count: int, ipv6: bool):
+    base = ipaddress.ip_address("2001:db8::" if ipv6 else "10.0.0.0")
+    for i in range(count):
+        yield str(base + i)
+
+
+async def _used_memory(client) -> int:
+    return (await client.info("memory"))["used_memory"]
+
+
+async def _load(client, algorithm, count: int, ipv6: bool) -> None:
+    script = client.register_script(algorithm.script)
+    pipe = client.pipeline(transaction=False)
+    pending = 0
+    for identifier in _identifiers(count, ipv6):
+        await script(keys=[algorithm.key(identifier)], args=[1, 100, _WINDOW_MS], client=pipe)
+        pending += 1
+        if pending == _PIPELINE:
+            await pipe.execute()
+            pending = 0
+    if pending:
+        await pipe.execute()
+
+
+async def _measure(client, label: str, algorithm, count: int, ipv6: bool) -> dict:
+    await client.flushdb()
+    before = await _used_memory(client)
+    started = time.perf_counter()
+    await _load(client, algorithm, count, ipv6)
+    elapsed = time.perf_counter() - started
+    used = await _used_memory(client) - before
+    result = {
+        "layout": label,
+        "identifiers": count,
+        "address_family": "ipv6" if ipv6 else "ipv4",
+        "redis_keys": await client.dbsize(),
+        "used_memory_bytes": used,
+        "bytes_per_identifier": round(used / count, 1),
+        "load_seconds": round(elapsed, 1),
+    }
+    print(f"{label:<8} {count:>10} ids  {used / 2 ** 20:10.1f} MiB  {used / count:6.1f} B/id", file=sys.stderr)
+    await client.flushdb()
+    return result
+
+
+async def _run(args) -> dict:
+    client = redis.from_url(args.redis_url)
+    try:
+        if await client.dbsize() and not args.flush:
+            raise SystemExit(f"{args.redis_url} is not empty; use a dedicated database or pass --flush")
+        results = []
+        for count in args.keys or [1_000_000, 10_000_000]:
+            # about 100 clients per bucket keeps buckets in the listpack encoding
+            compact = CompactFixedWindow(buckets=max(1, count // args.per_bucket))
+            results.append(await _measure(client, "per-key", FixedWindow(), count, args.ipv6))
+            results.append(await _measure(client, "compact", compact, count, args.ipv6))
+        server = await client.info("server")
+        return {"meta": {"redis_version": server.get("redis_version"), "timestamp": int(time.time())}, "results": results}
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--keys", action="append", type=int, help="identifiers per run, repeatable; default 1M and 10M")
+    parser.add_argument("--per-bucket", type=int, default=100, help="target clients per compact bucket")
+    parser.add_argument("--ipv6", action="store_true", help="use IPv6 identifiers instead of IPv4")
+    parser.add_argument("--flush", action="store_true", help="allow flushing a non-empty database")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(asyncio.run(_run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
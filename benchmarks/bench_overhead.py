@@ -0,0 +1,116 @@
+"""
+Per-request overhead of RedisRateLimitMiddleware versus the previous
+BaseHTTPMiddleware-based implementation.
+
+The ASGI app is driven in-process (no HTTP server, no sockets) and Redis is
+replaced by a client that answers instantly, so the numbers isolate the cost
+of the middleware plumbing itself.
+
+    python -m benchmarks.bench_overhead [--requests N]
+"""
+import argparse
+import asyncio
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from fastapi_redis_rate_limiter import RedisRateLimitMiddleware
+
+from .harness import drive, endpoint, make_scope, quiet_logging
+
+
+class _InstantPipeline:
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def incr(self, key):
+        self.ops.append(key)
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        key = self.ops[0]
+        self.store[key] = self.store.get(key, 0) + 1
+        return [self.store[key], True]
+
+
+class _InstantRedis:
+    """Stand-in client that answers every command without any I/O."""
+
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self):
+        return _InstantPipeline(self.store)
+
+    def register_script(self, source):
+        async def fixed_window(keys, args, client=None):
+            cost, limit, window_ms = args
+            count = self.store.get(keys[0], 0)
+            if count + cost > limit:
+                return [0, max(0, limit - count), window_ms, window_ms]
+            self.store[keys[0]] = count + cost
+            return [1, limit - count - cost, window_ms, 0]
+        return fixed_window
+
+    async def ttl(self, key):
+        return 60
+
+
+class _LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation the ASGI class replaced."""
+
+    def __init__(self, app, redis_client, rate_limit=5, time_window=60):
+        super().__init__(app)
+        self.redis_client = redis_client
+        self.rate_limit = rate_limit
+        self.time_window = time_window
+
+    async def dispatch(self, request, call_next):
+        client_identifier = request.client.host if request.client else "unknown"
+        key = f"rate_limit:{client_identifier}"
+        pipe = self.redis_client.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, self.time_window)
+        count, _ = await pipe.execute()
+        if count > self.rate_limit:
+            retry_after = await self.redis_client.ttl(key)
+            response = JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+        return await call_next(request)
+
+
+async def _drive(app, requests, distinct_clients):
+    scopes = [make_scope(f"10.0.{i // 256}.{i % 256}") for i in range(distinct_clients)]
+    run = await drive(app, scopes, requests)
+    return run["elapsed"] / requests
+
+
+def _bench(requests, rate_limit, distinct_clients):
+    rows = []
+    for label, cls in (("BaseHTTPMiddleware (legacy)", _LegacyRateLimitMiddleware), ("pure ASGI", RedisRateLimitMiddleware)):
+        baseline = asyncio.run(_drive(endpoint, requests, distinct_clients))
+        app = cls(endpoint, redis_client=_InstantRedis(), rate_limit=rate_limit, time_window=60)
+        per_request = asyncio.run(_drive(app, requests, distinct_clients))
+        rows.append((label, per_request, per_request - baseline))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=100)
+    args = parser.parse_args()
+    quiet_logging()
+
+    for title, rate_limit in (("allow path", args.requests + 1), ("deny path", 0)):
+        print(f"{title} ({args.requests} requests, {args.clients} clients)")
+        for label, per_request, overhead in _bench(args.requests, rate_limit, args.clients):
+            print(f"  {label:<30} {per_request * 1e6:8.2f} us/request  overhead {overhead * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
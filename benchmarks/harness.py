@@ -0,0 +1,82 @@
+"""
+Shared helpers for driving an ASGI app in-process and summarising timings.
+"""
+from typing import Dict, List, Sequence
+import asyncio
+import logging
+import time
+
+
+def quiet_logging() -> None:
+    """
+    Silences the library's info and warning lines (one per middleware
+    built, periodic denial summaries), which would clutter the reports.
+    """
+    logging.getLogger("fastapi_redis_rate_limiter").setLevel(logging.ERROR)
+
+
+async def endpoint(scope, receive, send):
+    """
+    The cheapest possible application: a fixed 200 response.
+    """
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def make_scope(client_ip: str, path: str = "/") -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": (client_ip, 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def drive(app, scopes: Sequence[dict], requests: int, concurrency: int = 1) -> dict:
+    """
+    Sends ``requests`` requests through ``app`` from ``concurrency`` tasks,
+    cycling through ``scopes``. Returns the wall time, every request's
+    latency in seconds and the count of responses per status code.
+    """
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    clock = time.perf_counter
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses[message["status"]] = statuses.get(message["status"], 0) + 1
+
+    async def worker(offset):
+        for i in range(offset, requests, concurrency):
+            scope = scopes[i % len(scopes)]
+            started = clock()
+            await app(scope, _receive, send)
+            latencies.append(clock() - started)
+
+    started = clock()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    return {"elapsed": clock() - started, "latencies": latencies, "statuses": statuses}
+
+
+def percentiles(values: Sequence[float], quantiles: Sequence[float] = (0.5, 0.99, 0.999)) -> Dict[str, float]:
+    """
+    Nearest-rank percentiles, keyed "p50", "p99", "p999".
+    """
+    ordered = sorted(values)
+    result = {}
+    for q in quantiles:
+        label = "p" + f"{q * 100:g}".replace(".", "")
+        result[label] = ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+    return result
@@ -1,3 +1,52 @@
-from .middleware import RedisRateLimitMiddleware
-
-__all__ = ["RedisRateLimitMiddleware"]
\ No newline at end of file
+from .adaptive import AIMD, AdaptiveLimiter, Gradient
+from .algorithms import GCRA, CompactFixedWindow, FixedWindow, RateLimitAlgorithm, SlidingWindow, TokenBucket
+from .backends import HashRing, MemoryBackend, RateLimitBackend, RedisBackend, ShardedRedisBackend
+from .batching import BatchStats, RequestBatcher
+from .circuit import CircuitBreaker, CircuitOpenError
+from .client_ip import ClientIPExtractor
+from .concurrency import ConcurrencyLimitMiddleware, ConcurrencySlots
+from .deny_cache import DenyCache
+from .fallback import FallbackLimiter
+from .heavy_hitters import CountMinSketch, HeavyHitterTracker, TopK
+from .leases import LeasePool
+from .metrics import DenialLog, RateLimitMetrics, prometheus_app
+from .middleware import RedisRateLimitMiddleware
+from .policies import Policy, PolicyTable
+from .result import RateLimitResult
+
+__all__ = [
+    "RedisRateLimitMiddleware",
+    "RateLimitResult",
+    "RateLimitAlgorithm",
+    "FixedWindow",
+    "CompactFixedWindow",
+    "SlidingWindow",
+    "TokenBucket",
+    "GCRA",
+    "DenyCache",
+    "RequestBatcher",
+    "BatchStats",
+    "LeasePool",
+    "RateLimitBackend",
+    "RedisBackend",
+    "MemoryBackend",
+    "ShardedRedisBackend",
+    "HashRing",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "FallbackLimiter",
+    "Policy",
+    "PolicyTable",
+    "RateLimitMetrics",
+    "DenialLog",
+    "prometheus_app",
+    "HeavyHitterTracker",
+    "CountMinSketch",
+    "TopK",
+    "ClientIPExtractor",
+    "ConcurrencyLimitMiddleware",
+    "ConcurrencySlots",
+    "AdaptiveLimiter",
+    "AIMD",
+    "Gradient",
+]
@@ -0,0 +1,198 @@
+from typing import Callable, Dict, List, Optional, Union
+import math
+import time
+
+DEFAULT_PRIORITIES = {"critical": 1.0, "default": 0.9, "low": 0.5}
+
+
+class AIMD:
+    """
+    Additive increase, multiplicative decrease: the limit grows by
+    ``increase`` after every healthy window in which the limit was actually
+    used, and is multiplied by ``backoff`` after a window whose p99 latency
+    exceeded ``target_latency`` seconds or whose error rate was too high.
+    """
+    def __init__(self, target_latency: float = 0.25, increase: float = 1.0, backoff: float = 0.9):
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be in (0, 1)")
+        self.target_latency = target_latency
+        self.increase = increase
+        self.backoff = backoff
+
+    def update(self, limit: float, p99: float, mean: float, overloaded: bool, saturated: bool) -> float:
+        if overloaded or p99 > self.target_latency:
+            return limit * self.backoff
+        if saturated:
+            return limit + self.increase
+        return limit
+
+
+class Gradient:
+    """
+    Gradient control: compares the window's mean latency with a slowly moving
+    baseline and scales the limit by their ratio (at most halving it per
+    window), plus a queue allowance of ``sqrt(limit)`` so the limit can probe
+    upwards while latency stays at the baseline. ``smoothing`` damps each step.
+    """
+    def __init__(self, smoothing: float = 0.2, baseline_decay: float = 0.05):
+        self.smoothing = smoothing
+        self.baseline_decay = baseline_decay
+        self.baseline = None
+
+    def update(self, limit: float, p99: float, mean: float, overloaded: bool, saturated: bool) -> float:
+        if self.baseline is None:
+            self.baseline = mean
+        self.baseline += (mean - self.baseline) * self.baseline_decay
+        if overloaded:
+            return limit / 2
+        gradient = max(0.5, min(1.0, self.baseline / mean)) if mean > 0 else 1.0
+        target = limit * gradient + (math.sqrt(limit) if saturated else 0)
+        return limit + (target - limit) * self.smoothing
+
+
+class AdaptiveLimiter:
+    """
+    Adaptive in-process concurrency limit for load shedding.
+
+    Measures how long the downstream handler takes and how often it fails,
+    and every ``window`` seconds (once ``min_samples`` requests finished)
+    lets the control algorithm (``"aimd"``, ``"gradient"`` or an instance)
+    move the limit on requests in flight in this process between
+    ``min_limit`` and ``max_limit``. A window with an error rate above
+    ``max_error_rate`` always counts as overloaded.
+
+    Priority classes shed in order: a request of class ``c`` is admitted only
+    while fewer than ``limit * priorities[c]`` (at least one) requests are in
+    flight, so as the limit shrinks, low-priority traffic is turned away first
+    while critical traffic keeps the full limit. Shed requests never reach the
+    handler, which keeps latency bounded instead of queueing. When a whole
+    window passes without a finished request while shedding, the limit is
+    re-evaluated at the next shed, so it cannot stay pinned at its minimum.
+    """
+    def __init__(
+        self,
+        algorithm: Union[str, AIMD, Gradient] = "aimd",
+        initial_limit: int = 100,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        window: float = 1.0,
+        min_samples: int = 10,
+        max_error_rate: float = 0.1,
+        priorities: Dict[str, float] = None,
+        key_priority: Callable[[str], Optional[str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if isinstance(algorithm, str):
+            if algorithm not in ("aimd", "gradient"):
+                raise ValueError(f"algorithm must be 'aimd' or 'gradient', got {algorithm!r}")
+            algorithm = AIMD() if algorithm == "aimd" else Gradient()
+        if not 0 < min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 0 < min_limit <= initial_limit <= max_limit")
+        self.algorithm = algorithm
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.priorities = dict(priorities or DEFAULT_PRIORITIES)
+        if "default" not in self.priorities:
+            self.priorities["default"] = 1.0
+        self.key_priority = key_priority
+        self.metrics = None
+        self._clock = clock
+
+        self.in_flight = 0
+        self._peak_in_flight = 0
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._window_start = clock()
+        self.shed: Dict[str, int] = {}
+        self.adjustments = 0
+
+    def priority_of(self, client_identifier: str, route_priority: Optional[str]) -> str:
+        """
+        The request's priority class: the key's class if ``key_priority``
+        assigns one, else the route's, else "default".
+        """
+        if self.key_priority is not None:
+            priority = self.key_priority(client_identifier)
+            if priority in self.priorities:
+                return priority
+        return route_priority if route_priority in self.priorities else "default"
+
+    def try_acquire(self, priority: str) -> bool:
+        """
+        Admits one request of ``priority`` or sheds it.
+        """
+        if self.in_flight >= self._share(priority):
+            now = self._clock()
+            if now - self._window_start >= self.window:
+                # nothing finished for a whole window, e.g. every slot is held by
+                # a stuck request; re-evaluate so the limit is not pinned
+                self._adjust(now)
+            if self.in_flight >= self._share(priority):
+                self.shed[priority] = self.shed.get(priority, 0) + 1
+                if self.metrics is not None:
+                    self.metrics.record_shed(priority)
+                return False
+        self.in_flight += 1
+        if self.in_flight > self._peak_in_flight:
+            self._peak_in_flight = self.in_flight
+        return True
+
+    def _share(self, priority: str) -> int:
+        # every class keeps at least one slot, so it can still be measured
+        return max(1, int(self.limit * self.priorities[priority]))
+
+    def cancel(self) -> None:
+        """
+        Gives back an admission that never reached the handler, e.g. because
+        the request was rate limited.
+        """
+        self.in_flight -= 1
+
+    def release(self, latency: float, error: bool) -> None:
+        """
+        Records a finished request and adjusts the limit at the end of a window.
+        """
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        if error:
+            self._errors += 1
+        now = self._clock()
+        if now - self._window_start >= self.window and len(self._latencies) >= self.min_samples:
+            self._adjust(now)
+
+    def _adjust(self, now: float) -> None:
+        latencies = sorted(self._latencies)
+        count = len(latencies)
+        old = self.limit
+        if count:
+            p99 = latencies[min(count - 1, int(0.99 * count))]
+            mean = sum(latencies) / count
+            overloaded = self._errors / count > self.max_error_rate
+            # only probe upwards when at least half of the limit was in use
+            saturated = self._peak_in_flight * 2 >= self.limit
+            limit = self.algorithm.update(old, p99, mean, overloaded, saturated)
+        else:
+            # no measurements while requests were being shed: probe one step up
+            p99 = None
+            limit = old + 1
+        self.limit = min(self.max_limit, max(self.min_limit, limit))
+        self._latencies = []
+        self._errors = 0
+        self._peak_in_flight = self.in_flight
+        self._window_start = now
+        if int(self.limit) != int(old):
+            self.adjustments += 1
+        if self.metrics is not None:
+            self.metrics.record_adaptive_limit(old, self.limit, p99)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "shed": dict(self.shed),
+            "adjustments": self.adjustments,
+        }
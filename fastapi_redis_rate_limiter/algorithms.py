@@ -0,0 +1,270 @@
+from typing import Optional, Sequence, Tuple, Union
+import hashlib
+import ipaddress
+import math
+
+from .result import RateLimitResult
+from . import scripts
+
+
+class RateLimitAlgorithm:
+    """
+    Base class for a rate limiting strategy.
+
+    A strategy is a set of Lua check/commit/refund functions (see ``scripts.py``) that runs
+    atomically in Redis in a single round trip, plus the key prefix its state
+    lives under. Prefixes differ per strategy so switching algorithms never
+    reads state written in another algorithm's format.
+
+    ``evaluate`` and ``refund_state`` are line-for-line Python twins of the Lua
+    functions, used by the in-memory backend. State is a small tuple of numbers
+    plus an absolute expiry, both in milliseconds; ``None`` means no state.
+    """
+    name: str = None
+    key_prefix: str = None
+    lua: str = None
+
+    def __init__(self):
+        self.script = scripts.build_script(self.lua)
+        self.batch_script = scripts.build_batch_script(self.lua)
+        self.lease_script = scripts.build_lease_script(self.lua)
+        self.refund_script = scripts.build_refund_script(self.lua)
+        self.tiered_script = scripts.build_tiered_script(self.lua)
+
+    def key(self, client_identifier: str, namespace: Optional[str] = None) -> str:
+        # The identifier is a hash tag, so every key of one client shares a cluster slot.
+        if namespace is None:
+            return f"{self.key_prefix}:{{{client_identifier}}}"
+        # The tag comes before the namespace: braces in a policy name (route
+        # templates like /orders/{order_id}) must not become the tag.
+        return f"{self.key_prefix}:{{{client_identifier}}}:{namespace}"
+
+    def tier_keys(self, key: str, tiers: Sequence[Tuple[int, int]]) -> list:
+        """
+        State keys of each (limit, window_ms) tier of ``key``. Tiers are keyed
+        by window, so changing a tier's limit keeps its count; the hash tag is
+        kept, so all tiers of a client share a cluster slot.
+        """
+        return [f"{key}:{window_ms}" for _, window_ms in tiers]
+
+    def parse(self, reply, limit: int) -> RateLimitResult:
+        """
+        Turns the script reply {allowed, remaining, reset_ms, retry_ms} into a result.
+        """
+        allowed, remaining, reset_ms, retry_ms = reply
+        return RateLimitResult(bool(allowed), limit, int(remaining), reset_ms / 1000, retry_ms / 1000)
+
+    def parse_tiered(self, reply, tiers: Sequence[Tuple[int, int]]) -> RateLimitResult:
+        """
+        Turns the tiered script reply {tier, allowed, remaining, reset_ms, retry_ms}
+        into a result reporting the most restrictive tier.
+        """
+        return self.parse(reply[1:], tiers[int(reply[0]) - 1][0])
+
+    def evaluate(self, values: Optional[tuple], expires_at: float, limit: int, window: int, now: float, cost: int):
+        """
+        Decides a request against ``values``. Returns
+        (allowed, remaining, reset_ms, retry_ms, new_values, new_expires_at);
+        the new state is None when the request is denied.
+        """
+        raise NotImplementedError
+
+    def refund_state(self, values: tuple, expires_at: float, limit: int, window: int, now: float, amount: int) -> Optional[Tuple[tuple, float]]:
+        """
+        Gives ``amount`` units back. Returns the new (values, expires_at), or
+        None when the key should be dropped.
+        """
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class FixedWindow(RateLimitAlgorithm):
+    """
+    Counts requests in consecutive fixed windows. Cheapest, but allows up to
+    twice the limit across a window boundary.
+    """
+    name = "fixed_window"
+    key_prefix = "rate_limit"
+    lua = scripts.FIXED_WINDOW
+
+    def evaluate(self, values, expires_at, limit, window, now, cost):
+        count = values[0] if values else 0
+        ttl = expires_at - now if values else window
+        if count + cost > limit:
+            return False, max(limit - count, 0), ttl, ttl, None, None
+        return True, limit - count - cost, ttl, 0, (count + cost,), expires_at if values else now + window
+
+    def refund_state(self, values, expires_at, limit, window, now, amount):
+        count = values[0]
+        return (count - min(amount, max(count, 0)),), expires_at
+
+
+class CompactFixedWindow(RateLimitAlgorithm):
+    """
+    Fixed windows aligned to the clock, in a memory-compact Redis layout.
+
+    Instead of one string key per client, counters are fields of a hash per
+    window and bucket; a client maps to one of ``buckets`` buckets by a hash
+    of its identifier, and the bucket expires as a whole at the end of the
+    window. Fields are binary: 4 or 16 bytes for IPv4/IPv6 addresses, an
+    8-byte digest for anything else. Size ``buckets`` so each holds at most
+    ~100 clients (Redis' default ``hash-max-listpack-entries`` is 128) and
+    buckets stay in the compact encoding.
+    """
+    name = "compact_fixed_window"
+    key_prefix = "rate_limit:c"
+    lua = scripts.COMPACT_FIXED_WINDOW
+
+    def __init__(self, buckets: int = 65536):
+        if buckets <= 0:
+            raise ValueError("buckets must be positive")
+        super().__init__()
+        self.buckets = buckets
+
+    def key(self, client_identifier: str, namespace: Optional[str] = None) -> str:
+        if namespace is not None:
+            client_identifier = f"{namespace}:{client_identifier}"
+        digest = hashlib.blake2b(client_identifier.encode("utf-8"), digest_size=16).digest()
+        try:
+            field = ipaddress.ip_address(client_identifier).packed
+        except ValueError:
+            field = digest[:8]
+        bucket = int.from_bytes(digest[8:], "big") % self.buckets
+        return f"{self.key_prefix}:{{{bucket:x}}}:{field.hex()}"
+
+    def tier_keys(self, key: str, tiers: Sequence[Tuple[int, int]]) -> list:
+        # the window goes into the bucket name; the field stays last
+        head, field = key.rsplit(":", 1)
+        return [f"{head}:{window_ms}:{field}" for _, window_ms in tiers]
+
+    def evaluate(self, values, expires_at, limit, window, now, cost):
+        index = now // window
+        count = values[1] if values and values[0] == index else 0
+        ttl = (index + 1) * window - now
+        if count + cost > limit:
+            return False, max(limit - count, 0), ttl, ttl, None, None
+        return True, limit - count - cost, ttl, 0, (index, count + cost), (index + 1) * window
+
+    def refund_state(self, values, expires_at, limit, window, now, amount):
+        index, count = values
+        if index == now // window:
+            return (index, count - min(amount, max(count, 0))), expires_at
+        return values, expires_at
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(buckets={self.buckets})"
+
+
+class SlidingWindow(RateLimitAlgorithm):
+    """
+    Sliding-window counter: weights the previous window's count by its overlap
+    with the sliding window. Smooths the boundary burst of FixedWindow while
+    storing only three numbers per key.
+    """
+    name = "sliding_window"
+    key_prefix = "rate_limit:sw"
+    lua = scripts.SLIDING_WINDOW
+
+    def evaluate(self, values, expires_at, limit, window, now, cost):
+        index = now // window
+        current = previous = 0
+        if values:
+            stored, stored_current, stored_previous = values
+            if stored == index:
+                current, previous = stored_current, stored_previous
+            elif stored == index - 1:
+                previous = stored_current
+
+        elapsed = now - index * window
+        estimate = previous * (window - elapsed) / window + current
+        if estimate + cost > limit:
+            if current + cost <= limit:
+                retry = window - (limit - current - cost) * window / previous - elapsed
+            else:
+                retry = window - elapsed
+                if current > limit - cost:
+                    retry += window - (limit - cost) * window / current
+            reset = window - elapsed + (window if current > 0 else 0)
+            return False, max(math.floor(limit - estimate), 0), reset, math.ceil(retry), None, None
+        remaining = max(math.floor(limit - estimate - cost), 0)
+        return True, remaining, 2 * window - elapsed, 0, (index, current + cost, previous), now + 2 * window
+
+    def refund_state(self, values, expires_at, limit, window, now, amount):
+        stored, current, previous = values
+        if stored == now // window:
+            return (stored, max(current - amount, 0), previous), expires_at
+        return values, expires_at
+
+
+class TokenBucket(RateLimitAlgorithm):
+    """
+    Token bucket holding ``rate_limit`` tokens, refilled continuously at
+    ``rate_limit`` tokens per ``time_window``.
+    """
+    name = "token_bucket"
+    key_prefix = "rate_limit:tb"
+    lua = scripts.TOKEN_BUCKET
+
+    def evaluate(self, values, expires_at, limit, window, now, cost):
+        rate = limit / window
+        tokens, last = values if values else (limit, now)
+        if now > last:
+            tokens = min(limit, tokens + (now - last) * rate)
+        if tokens < cost:
+            return False, math.floor(tokens), math.ceil((limit - tokens) / rate), math.ceil((cost - tokens) / rate), None, None
+        tokens -= cost
+        expiry = now + max(math.ceil((limit - tokens) * window / limit), 1)
+        return True, math.floor(tokens), math.ceil((limit - tokens) / rate), 0, (tokens, now), expiry
+
+    def refund_state(self, values, expires_at, limit, window, now, amount):
+        tokens = self.evaluate(values, expires_at, limit, window, now, 0)[4][0]
+        tokens = min(limit, tokens + amount)
+        if tokens >= limit:
+            return None
+        return (tokens, now), now + max(math.ceil((limit - tokens) * window / limit), 1)
+
+
+class GCRA(RateLimitAlgorithm):
+    """
+    Generic cell rate algorithm: spaces requests ``time_window / rate_limit``
+    apart with a burst of up to ``rate_limit``, storing a single timestamp per key.
+    """
+    name = "gcra"
+    key_prefix = "rate_limit:gcra"
+    lua = scripts.GCRA
+
+    def evaluate(self, values, expires_at, limit, window, now, cost):
+        interval = window / limit
+        tat = max(values[0], now) if values else now
+        new_tat = tat + interval * cost
+        allow_at = new_tat - window
+        if now < allow_at:
+            remaining = max(math.floor((window - (tat - now)) / interval), 0)
+            return False, remaining, math.ceil(tat - now), math.ceil(allow_at - now), None, None
+        remaining = math.floor((window - (new_tat - now)) / interval)
+        return True, remaining, math.ceil(new_tat - now), 0, (new_tat,), now + max(math.ceil(new_tat - now), 1)
+
+    def refund_state(self, values, expires_at, limit, window, now, amount):
+        tat = values[0] - window / limit * amount
+        if tat <= now:
+            return None
+        return (tat,), now + max(math.ceil(tat - now), 1)
+
+
+ALGORITHMS = {cls.name: cls for cls in (FixedWindow, CompactFixedWindow, SlidingWindow, TokenBucket, GCRA)}
+
+
+def get_algorithm(algorithm: Union[str, RateLimitAlgorithm, None]) -> RateLimitAlgorithm:
+    """
+    Resolves an algorithm given by name or instance; defaults to FixedWindow.
+    """
+    if algorithm is None:
+        return FixedWindow()
+    if isinstance(algorithm, RateLimitAlgorithm):
+        return algorithm
+    try:
+        return ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(f"Unknown rate limiting algorithm {algorithm!r}; expected one of {sorted(ALGORITHMS)}")
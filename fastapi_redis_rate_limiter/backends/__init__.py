@@ -0,0 +1,6 @@
+from .base import RateLimitBackend
+from .memory import MemoryBackend
+from .redis_backend import RedisBackend
+from .sharded import HashRing, ShardedRedisBackend
+
+__all__ = ["RateLimitBackend", "RedisBackend", "ShardedRedisBackend", "HashRing", "MemoryBackend"]
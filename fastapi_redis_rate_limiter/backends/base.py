@@ -0,0 +1,70 @@
+from typing import List
+
+from ..algorithms import RateLimitAlgorithm
+from ..result import RateLimitResult
+
+
+class RateLimitBackend:
+    """
+    Interface the middleware uses to store rate limit state.
+
+    Every method makes one atomic decision (or batch of decisions) for the
+    given algorithm; ``window_ms`` is the window length in milliseconds.
+    """
+
+    async def check(self, algorithm: RateLimitAlgorithm, key: str, limit: int, window_ms: int, cost: int = 1) -> RateLimitResult:
+        """
+        Decides one request.
+        """
+        raise NotImplementedError
+
+    async def check_batch(self, algorithm: RateLimitAlgorithm, items: List[tuple], counts: List[int]) -> List[List[RateLimitResult]]:
+        """
+        Decides a coalesced batch of (key, limit, window_ms) items, ``counts[i]``
+        requests for ``items[i]``. Returns, per item, one result per request.
+        """
+        return [
+            [await self.check(algorithm, key, limit, window_ms) for _ in range(count)]
+            for (key, limit, window_ms), count in zip(items, counts)
+        ]
+
+    async def check_tiers(self, algorithm: RateLimitAlgorithm, key: str, tiers: List[tuple], cost: int = 1) -> RateLimitResult:
+        """
+        Decides one request against every (limit, window_ms) tier of ``key``.
+        The request counts against all tiers only if every tier allows it; the
+        result describes the most restrictive tier.
+        """
+        raise NotImplementedError
+
+    async def lease(self, algorithm: RateLimitAlgorithm, key: str, amount: int, limit: int, window_ms: int) -> list:
+        """
+        Takes up to ``amount`` units of quota at once; returns
+        [granted, remaining, reset_ms, retry_ms].
+        """
+        raise NotImplementedError
+
+    async def refund(self, algorithm: RateLimitAlgorithm, key: str, amount: int, limit: int, window_ms: int) -> None:
+        """
+        Gives back ``amount`` units of previously leased quota.
+        """
+        raise NotImplementedError
+
+    async def acquire_slots(self, key: str, holder: str, amount: int, limit: int, ttl_ms: int) -> list:
+        """
+        Takes up to ``amount`` of the ``limit`` concurrency slots of ``key`` for
+        ``holder`` and renews the holder's lease on them for ``ttl_ms``.
+        Returns [granted, slots in use after the call].
+        """
+        raise NotImplementedError
+
+    async def release_slots(self, key: str, holder: str, amount: int, ttl_ms: int) -> int:
+        """
+        Gives back ``amount`` slots of ``key`` held by ``holder``; returns how
+        many the holder still has.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """
+        Releases connections or other resources held by the backend.
+        """
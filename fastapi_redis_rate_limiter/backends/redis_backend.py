@@ -0,0 +1,103 @@
+from typing import Dict, Hashable, List, Tuple
+import asyncio
+
+import redis.asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.crc import key_slot
+
+from ..algorithms import RateLimitAlgorithm
+from ..result import RateLimitResult
+from .. import scripts
+from .base import RateLimitBackend
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Runs the algorithm scripts against Redis.
+
+    Works with a plain ``redis.asyncio.Redis`` client or a ``RedisCluster``
+    client. Keys carry the client identifier as a hash tag
+    (``rate_limit:{1.2.3.4}``), so every key a script touches for one client
+    maps to the same cluster slot; batches that span clients are split per
+    slot and sent concurrently.
+    """
+    def __init__(self, redis_client: redis.Redis):
+        self.redis_client = redis_client
+        self._cluster = isinstance(redis_client, RedisCluster)
+        self._scripts = {}
+
+    def _route(self, key: str) -> Tuple[Hashable, redis.Redis]:
+        """
+        Returns (shard id, client) for a key. Keys with equal shard ids may
+        share a multi-key script call.
+        """
+        if self._cluster:
+            return key_slot(key.encode("utf-8")), self.redis_client
+        return 0, self.redis_client
+
+    def _script(self, source: str):
+        # One script object per source; the SHA is the same on every node and
+        # redis-py reloads it on whichever client reports NOSCRIPT.
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self.redis_client.register_script(source)
+        return script
+
+    async def check(self, algorithm: RateLimitAlgorithm, key: str, limit: int, window_ms: int, cost: int = 1) -> RateLimitResult:
+        _, client = self._route(key)
+        reply = await self._script(algorithm.script)(keys=[key], args=[cost, limit, window_ms], client=client)
+        return algorithm.parse(reply, limit)
+
+    async def check_batch(self, algorithm: RateLimitAlgorithm, items: List[tuple], counts: List[int]) -> List[List[RateLimitResult]]:
+        """
+        Runs the whole batch as one multi-key script call per slot or node.
+        """
+        shards: Dict[Hashable, list] = {}
+        for index, item in enumerate(items):
+            shard, client = self._route(item[0])
+            shards.setdefault(shard, (client, []))[1].append(index)
+
+        results: List[List[RateLimitResult]] = [None] * len(items)
+        script = self._script(algorithm.batch_script)
+
+        async def run_shard(client, indexes):
+            args = []
+            for index in indexes:
+                _, limit, window_ms = items[index]
+                args.extend((counts[index], limit, window_ms))
+            reply = await script(keys=[items[index][0] for index in indexes], args=args, client=client)
+            offset = 0
+            for index in indexes:
+                limit = items[index][1]
+                results[index] = [algorithm.parse(reply[offset + 4 * i:offset + 4 * i + 4], limit) for i in range(counts[index])]
+                offset += 4 * counts[index]
+
+        await asyncio.gather(*(run_shard(client, indexes) for client, indexes in shards.values()))
+        return results
+
+    async def check_tiers(self, algorithm: RateLimitAlgorithm, key: str, tiers: List[tuple], cost: int = 1) -> RateLimitResult:
+        _, client = self._route(key)
+        args = [cost]
+        for limit, window_ms in tiers:
+            args.extend((limit, window_ms))
+        reply = await self._script(algorithm.tiered_script)(keys=algorithm.tier_keys(key, tiers), args=args, client=client)
+        return algorithm.parse_tiered(reply, tiers)
+
+    async def lease(self, algorithm: RateLimitAlgorithm, key: str, amount: int, limit: int, window_ms: int) -> list:
+        _, client = self._route(key)
+        return await self._script(algorithm.lease_script)(keys=[key], args=[amount, limit, window_ms], client=client)
+
+    async def refund(self, algorithm: RateLimitAlgorithm, key: str, amount: int, limit: int, window_ms: int) -> None:
+        _, client = self._route(key)
+        await self._script(algorithm.refund_script)(keys=[key], args=[amount, limit, window_ms], client=client)
+
+    async def acquire_slots(self, key: str, holder: str, amount: int, limit: int, ttl_ms: int) -> list:
+        _, client = self._route(key)
+        return await self._script(scripts.CONCURRENCY_ACQUIRE)(keys=[key, f"{key}:holders"], args=[holder, amount, limit, ttl_ms], client=client)
+
+    async def release_slots(self, key: str, holder: str, amount: int, ttl_ms: int) -> int:
+        _, client = self._route(key)
+        return await self._script(scripts.CONCURRENCY_RELEASE)(keys=[key, f"{key}:holders"], args=[holder, amount, ttl_ms], client=client)
+
+    async def close(self) -> None:
+        await self.redis_client.aclose()
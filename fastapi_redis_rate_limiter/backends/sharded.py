@@ -0,0 +1,92 @@
+from bisect import bisect
+from typing import Hashable, List, Sequence, Tuple
+import hashlib
+
+import redis.asyncio as redis
+
+from .redis_backend import RedisBackend
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def hash_tag(key: str) -> str:
+    """
+    Returns the part of a key Redis Cluster would hash: the text inside the
+    first ``{...}``, or the whole key when there is no non-empty tag.
+    """
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes.
+
+    Each node is placed on the ring ``replicas`` times, so load spreads evenly
+    and adding or removing a node only moves about ``1 / len(nodes)`` of the keys.
+    """
+    def __init__(self, node_names: Sequence[str], replicas: int = 128):
+        if not node_names:
+            raise ValueError("HashRing needs at least one node")
+        points = sorted(
+            (_hash(f"{name}#{replica}"), index)
+            for index, name in enumerate(node_names)
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [index for _, index in points]
+
+    def node_for(self, value: str) -> int:
+        """
+        Index of the node owning ``value``.
+        """
+        position = bisect(self._hashes, _hash(value))
+        return self._nodes[position % len(self._nodes)]
+
+
+class ShardedRedisBackend(RedisBackend):
+    """
+    Spreads keys over several independent Redis instances with a client-side
+    consistent-hash ring.
+
+    Keys are placed by their hash tag, the same rule Redis Cluster uses, so all
+    keys a multi-key script touches for one client live on one node. Batches
+    are split per node and sent concurrently.
+    """
+    def __init__(self, redis_clients: Sequence[redis.Redis], node_names: Sequence[str] = None, replicas: int = 128):
+        if not redis_clients:
+            raise ValueError("ShardedRedisBackend needs at least one Redis client")
+        super().__init__(redis_clients[0])
+        self.redis_clients: List[redis.Redis] = list(redis_clients)
+        if node_names is None:
+            node_names = [_node_name(client, index) for index, client in enumerate(self.redis_clients)]
+            if len(set(node_names)) != len(node_names):
+                node_names = [f"node-{index}" for index in range(len(self.redis_clients))]
+        self.ring = HashRing(node_names, replicas)
+
+    def _route(self, key: str) -> Tuple[Hashable, redis.Redis]:
+        index = self.ring.node_for(hash_tag(key))
+        return index, self.redis_clients[index]
+
+    async def close(self) -> None:
+        for client in self.redis_clients:
+            await client.aclose()
+
+
+def _node_name(client: redis.Redis, index: int) -> str:
+    """
+    Stable ring name for a client: its host:port/db when known, so the ring
+    does not reshuffle if clients are passed in a different order.
+    """
+    try:
+        kwargs = client.connection_pool.connection_kwargs
+        return f"{kwargs['host']}:{kwargs['port']}/{kwargs.get('db', 0)}"
+    except (AttributeError, KeyError):
+        return f"node-{index}"
+
@@ -0,0 +1,137 @@
+from typing import Awaitable, Callable, Hashable, List
+import asyncio
+
+
+class BatchStats:
+    """
+    Running counters describing how well requests are being coalesced.
+    """
+    def __init__(self):
+        self.batches = 0
+        self.requests = 0
+        self.distinct_items = 0
+        self.max_batch_size = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    @property
+    def mean_queue_delay(self) -> float:
+        """
+        Mean time (seconds) a check waited in the queue before its batch was sent.
+        """
+        return self.total_queue_delay / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "distinct_items": self.distinct_items,
+            "max_batch_size": self.max_batch_size,
+            "mean_batch_size": self.mean_batch_size,
+            "mean_queue_delay": self.mean_queue_delay,
+            "max_queue_delay": self.max_queue_delay,
+        }
+
+
+class RequestBatcher:
+    """
+    Coalesces concurrent limiter checks into one backend call.
+
+    Checks are queued until either ``max_batch_size`` of them are waiting or
+    ``max_delay`` seconds have passed since the first one arrived, then sent
+    together. Identical items (same key and limits) are merged into one entry
+    with a request count, and the per-request replies are fanned back out to
+    the waiting callers in arrival order.
+
+    The batcher is opt-in: every check pays up to ``max_delay`` of extra
+    latency in exchange for far fewer, larger backend round trips.
+    """
+    def __init__(self, max_batch_size: int = 128, max_delay: float = 0.001):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.stats = BatchStats()
+        self._execute = None
+        self._pending = []
+        self._timer = None
+        self._inflight = set()
+
+    def bind(self, execute: Callable[[List[Hashable], List[int]], Awaitable[List[list]]]) -> None:
+        """
+        Sets the coroutine that runs a batch. It receives the distinct items and
+        how many requests each stands for, and returns, per item, the list of
+        replies for those requests.
+        """
+        if self._execute is not None and self._execute != execute:
+            raise RuntimeError("RequestBatcher is already bound to another limiter")
+        self._execute = execute
+
+    async def submit(self, item: Hashable):
+        """
+        Queues one check and waits for its reply.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, loop.time()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        # keep a reference so the task is not garbage collected mid-flight
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: list) -> None:
+        now = asyncio.get_running_loop().time()
+        counts = {}
+        for item, _, _ in batch:
+            counts[item] = counts.get(item, 0) + 1
+
+        stats = self.stats
+        stats.batches += 1
+        stats.requests += len(batch)
+        stats.distinct_items += len(counts)
+        stats.max_batch_size = max(stats.max_batch_size, len(batch))
+        for _, _, queued_at in batch:
+            delay = now - queued_at
+            stats.total_queue_delay += delay
+            if delay > stats.max_queue_delay:
+                stats.max_queue_delay = delay
+
+        items = list(counts)
+        try:
+            replies = await self._execute(items, [counts[item] for item in items])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        per_item = {item: iter(item_replies) for item, item_replies in zip(items, replies)}
+        for item, future, _ in batch:
+            reply = next(per_item[item])
+            if not future.done():  # the caller may have gone away
+                future.set_result(reply)
+
+    async def drain(self) -> None:
+        """
+        Sends anything still queued and waits for in-flight batches.
+        """
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
@@ -0,0 +1,131 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the backend while the circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around backend calls.
+
+    Closed: calls go through; ``failure_threshold`` consecutive failures trip
+    the breaker. A call that errors, exceeds ``call_timeout`` or takes longer
+    than ``latency_threshold`` counts as a failure.
+
+    Open: calls fail immediately with CircuitOpenError, so no request waits
+    on a dead backend. After ``reset_timeout`` seconds the breaker goes
+    half-open.
+
+    Half-open: up to ``half_open_max_calls`` probe calls are let through; a
+    successful probe closes the breaker, a failed one opens it again.
+    """
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 5.0,
+        call_timeout: Optional[float] = 0.25,
+        latency_threshold: Optional[float] = None,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.latency_threshold = latency_threshold
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self.state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the backend right now.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.reset_timeout:
+                return False
+            self._transition(HALF_OPEN)
+        if self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def record_success(self, latency: float) -> None:
+        if self.latency_threshold is not None and latency > self.latency_threshold:
+            self.record_failure()
+            return
+        self._consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._consecutive_failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self.times_opened += 1
+        self._probes = 0
+        if state == CLOSED:
+            self._consecutive_failures = 0
+        logger.warning(f"Rate limiter circuit breaker {self.state} -> {state}.")
+        self.state = state
+
+    async def call(self, fn: Callable[..., Awaitable], *args):
+        """
+        Runs ``fn(*args)`` through the breaker.
+        """
+        if not self.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError("Rate limiting backend circuit is open.")
+        self.calls += 1
+        started = self._clock()
+        try:
+            if self.call_timeout is None:
+                result = await fn(*args)
+            else:
+                result = await asyncio.wait_for(fn(*args), self.call_timeout)
+        except asyncio.CancelledError:
+            # the caller went away; the probe slot it held is free again
+            if self.state == HALF_OPEN:
+                self._probes -= 1
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(self._clock() - started)
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,136 @@
+from typing import Dict, Iterable, Optional, Tuple, Union
+import ipaddress
+
+from starlette.types import Scope
+
+# Only a proxy on the same host is trusted by default. Anything reaching the
+# app over a network, private ones included, could otherwise pick its own
+# identity; list load balancers and reverse proxies explicitly.
+DEFAULT_TRUSTED_PROXIES = (
+    "127.0.0.0/8",
+    "::1/128",
+)
+
+_Address = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class _PrefixSet:
+    """
+    Longest-prefix membership test for one address family: one set of network
+    integers per prefix length, probed from the longest length down. Lookups
+    cost one shift and one set probe per distinct prefix length configured.
+    """
+    def __init__(self, bits: int, networks: Iterable[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]):
+        self.bits = bits
+        by_length: Dict[int, set] = {}
+        for network in networks:
+            by_length.setdefault(network.prefixlen, set()).add(int(network.network_address) >> (bits - network.prefixlen))
+        self._levels = tuple(sorted(((self.bits - length, prefixes) for length, prefixes in by_length.items()), key=lambda level: level[0]))
+
+    def __contains__(self, address: int) -> bool:
+        for shift, prefixes in self._levels:
+            if address >> shift in prefixes:
+                return True
+        return False
+
+
+class ClientIPExtractor:
+    """
+    Synchronous client address extraction that cannot be spoofed from outside.
+
+    ``X-Forwarded-For`` is only consulted when the connection comes from a
+    trusted proxy, and is walked from the right: each entry was appended by
+    the hop to its right, so the first address that is not itself a trusted
+    proxy is the client. Anything left of it was supplied by the client and
+    is ignored. Only loopback peers are trusted unless ``trusted_proxies``
+    lists the deployment's proxies, e.g. ``["10.0.0.0/8"]`` behind a load
+    balancer in that network.
+
+    ``ipv4_prefix`` / ``ipv6_prefix`` aggregate clients into networks (e.g.
+    ``ipv6_prefix=64``, since one IPv6 subscriber usually owns a /64); the
+    identifier is then the network in CIDR form.
+
+    Results are cached by connection (peer address and port) and forwarding
+    header, so requests on a keep-alive connection skip parsing entirely.
+    At most ``cache_size`` entries are kept; the oldest are dropped first.
+    """
+    def __init__(
+        self,
+        trusted_proxies: Iterable[str] = DEFAULT_TRUSTED_PROXIES,
+        ipv4_prefix: int = 32,
+        ipv6_prefix: int = 128,
+        header: str = "x-forwarded-for",
+        cache_size: int = 10000,
+    ):
+        if not 0 < ipv4_prefix <= 32 or not 0 < ipv6_prefix <= 128:
+            raise ValueError("ipv4_prefix must be in 1..32 and ipv6_prefix in 1..128")
+        networks = [ipaddress.ip_network(cidr, strict=False) for cidr in trusted_proxies]
+        self._trusted = {
+            4: _PrefixSet(32, [n for n in networks if n.version == 4]),
+            6: _PrefixSet(128, [n for n in networks if n.version == 6]),
+        }
+        self.ipv4_prefix = ipv4_prefix
+        self.ipv6_prefix = ipv6_prefix
+        self.header = header.lower().encode("latin-1")
+        self.cache_size = cache_size
+        self._cache: Dict[Tuple, str] = {}
+
+    def __call__(self, scope: Scope) -> str:
+        client = scope.get("client")
+        forwarded = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                # repeated headers form one list, in order
+                forwarded = value if forwarded is None else forwarded + b"," + value
+        # some servers (e.g. Daphne) pass the client as a list, which cannot key a dict
+        cache_key = (tuple(client) if client else None, forwarded)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        identifier = self._extract(client[0] if client else None, forwarded)
+        cache = self._cache
+        if len(cache) >= self.cache_size:
+            del cache[next(iter(cache))]
+        cache[cache_key] = identifier
+        return identifier
+
+    def is_trusted(self, address: _Address) -> bool:
+        return int(address) in self._trusted[address.version]
+
+    def _extract(self, peer: Optional[str], forwarded: Optional[bytes]) -> str:
+        address = _parse(peer) if peer else None
+        if address is None:
+            return peer or "unknown"
+        if forwarded is not None and self.is_trusted(address):
+            for entry in reversed(forwarded.decode("latin-1").split(",")):
+                hop = _parse(entry.strip())
+                if hop is None:
+                    # a trusted proxy passed on garbage; the proxy is the best we know
+                    break
+                address = hop
+                if not self.is_trusted(hop):
+                    break
+        return self._aggregate(address)
+
+    def _aggregate(self, address: _Address) -> str:
+        prefix = self.ipv4_prefix if address.version == 4 else self.ipv6_prefix
+        if prefix == address.max_prefixlen:
+            return str(address)
+        return str(ipaddress.ip_network((address, prefix), strict=False))
+
+
+def _parse(text: str) -> Optional[_Address]:
+    try:
+        address = ipaddress.ip_address(text)
+    except ValueError:
+        if text.startswith("[") and "]" in text:
+            # "[v6]:port"
+            return _parse(text[1:text.index("]")])
+        if text.count(":") == 1:
+            # "v4:port"
+            return _parse(text.split(":")[0])
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
@@ -0,0 +1,235 @@
+from typing import Callable, Dict, Optional
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+import redis.asyncio as redis
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .backends import RateLimitBackend, RedisBackend
+from .client_ip import ClientIPExtractor
+from .middleware import _JSON_CONTENT_TYPE, _UNAVAILABLE_BODY
+from .result import RateLimitResult
+
+logger = logging.getLogger(__name__)
+
+
+class _Slots:
+    __slots__ = ("held", "in_use", "pending", "expires_at")
+
+    def __init__(self):
+        self.held = 0
+        self.in_use = 0
+        # acquires waiting on the backend; they hold no slot until granted
+        self.pending = 0
+        self.expires_at = 0.0
+
+
+class ConcurrencySlots:
+    """
+    This process' share of a distributed semaphore.
+
+    Slots are leased from the backend for ``ttl`` seconds under a holder id
+    unique to the process; every acquire renews the lease, and a crashed
+    worker's slots return to the pool once its lease runs out. Requests that
+    finish keep up to ``keep_idle`` slots per key in the process, so the next
+    request for that key is admitted locally without a backend call. With the
+    default of 0 every acquire and release is exactly one backend call.
+
+    ``ttl`` must exceed the longest request: a slot held longer than that is
+    considered leaked and handed out again.
+    """
+    def __init__(self, backend: RateLimitBackend, ttl: float = 30.0, keep_idle: int = 0, clock: Callable[[], float] = time.monotonic):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if keep_idle < 0:
+            raise ValueError("keep_idle must not be negative")
+        self.backend = backend
+        self.ttl_ms = int(ttl * 1000)
+        self.keep_idle = keep_idle
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._clock = clock
+        self._slots: Dict[str, _Slots] = {}
+        self.local_hits = 0
+
+    async def acquire(self, key: str, limit: int) -> RateLimitResult:
+        """
+        Takes one slot for ``key``. A denial means ``limit`` requests are
+        already in flight across all workers.
+        """
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = _Slots()
+        now = self._clock()
+        if now >= slots.expires_at:
+            # the backend has dropped a lapsed lease, idle slots included
+            slots.held = 0
+        elif slots.in_use < slots.held:
+            slots.in_use += 1
+            self.local_hits += 1
+            return RateLimitResult(True, limit, limit - slots.in_use, 0, 0)
+
+        slots.pending += 1
+        try:
+            granted, in_flight = await self.backend.acquire_slots(key, self.holder, 1, limit, self.ttl_ms)
+        except BaseException:
+            slots.pending -= 1
+            self._forget(key, slots)
+            raise
+        slots.pending -= 1
+        if slots.held or granted:
+            slots.expires_at = now + self.ttl_ms / 1000
+        slots.held += granted
+        slots.in_use += granted
+        try:
+            # requests that finished meanwhile may have left more idle slots than keep_idle
+            await self._return_surplus(key, slots)
+        except Exception as e:
+            logger.error(f"Concurrency limiter could not return idle slots (key: {key}): {e}")
+        if not granted:
+            return RateLimitResult(False, limit, 0, 0, 1)
+        return RateLimitResult(True, limit, max(limit - in_flight, 0), 0, 0)
+
+    async def release(self, key: str) -> None:
+        """
+        Gives back the slot of a finished request, keeping up to ``keep_idle``
+        idle slots in the process.
+        """
+        slots = self._slots.get(key)
+        if slots is None:
+            return
+        slots.in_use -= 1
+        await self._return_surplus(key, slots)
+
+    async def _return_surplus(self, key: str, slots: _Slots) -> None:
+        surplus = slots.held - slots.in_use - self.keep_idle
+        if surplus > 0:
+            slots.held -= surplus
+        self._forget(key, slots)
+        if surplus > 0:
+            await self.backend.release_slots(key, self.holder, surplus, self.ttl_ms)
+
+    def _forget(self, key: str, slots: _Slots) -> None:
+        if slots.in_use <= 0 and slots.held <= 0 and slots.pending <= 0:
+            self._slots.pop(key, None)
+
+    async def drain(self) -> None:
+        """
+        Returns every slot this process holds, e.g. at shutdown.
+        """
+        held, self._slots = self._slots, {}
+        for key, slots in held.items():
+            if slots.held > 0:
+                await self.backend.release_slots(key, self.holder, slots.held, self.ttl_ms)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Limits the number of requests in flight at once per key, across workers.
+
+    Rate limits do not protect slow endpoints: a handful of clients can keep
+    every worker busy well within their request rate. This middleware admits
+    a request only while fewer than ``limit`` requests with the same key are
+    running anywhere, and frees the slot as soon as the response has been
+    sent (or the app fails). The key is the client address by default;
+    ``key_func`` receives the ASGI scope, e.g. ``lambda scope: scope["path"]``
+    to limit per route.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        redis_client: redis.Redis = None,
+        limit: int = 10,
+        key_func: Callable[[Scope], str] = None,
+        backend: RateLimitBackend = None,
+        slots: ConcurrencySlots = None,
+        exceeded_response: dict = None,
+        exempt_paths=("/health",),
+        failure_mode: str = "closed",
+        key_prefix: str = "concurrency",
+    ):
+        if slots is None:
+            if backend is None:
+                if redis_client is None:
+                    raise ValueError("ConcurrencyLimitMiddleware needs a redis_client, a backend or slots")
+                backend = RedisBackend(redis_client)
+            slots = ConcurrencySlots(backend)
+        if failure_mode not in ("closed", "open"):
+            raise ValueError(f"failure_mode must be 'closed' or 'open', got {failure_mode!r}")
+        self.app = app
+        self.limit = limit
+        self.key_func = key_func or ClientIPExtractor()
+        self.slots = slots
+        self.exempt_paths = frozenset(exempt_paths)
+        self.failure_mode = failure_mode
+        self.key_prefix = key_prefix
+        self._exceeded_body = json.dumps(exceeded_response or {"detail": "Too many concurrent requests"}).encode("utf-8")
+        logger.info(f"ConcurrencyLimitMiddleware initialized: Limit={self.limit} requests in flight.")
+
+    def _key(self, scope: Scope) -> str:
+        # hash tag, so both keys of the semaphore share a cluster slot
+        return f"{self.key_prefix}:{{{self.key_func(scope)}}}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.app(scope, receive, self._lifespan_send(send))
+            return
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        try:
+            result = await self.slots.acquire(key, self.limit)
+        except Exception as e:
+            logger.error(f"Concurrency limiter backend error (key: {key}): {e}")
+            if self.failure_mode == "open":
+                await self.app(scope, receive, send)
+            else:
+                await self._reject(send, 503, _UNAVAILABLE_BODY)
+            return
+        if not result.allowed:
+            await self._reject(send, 429, self._exceeded_body, [(b"retry-after", b"1")])
+            return
+
+        released = False
+
+        async def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                try:
+                    await self.slots.release(key)
+                except Exception as e:
+                    # the lease expires on its own; nothing leaks for longer than the TTL
+                    logger.error(f"Concurrency limiter could not release a slot (key: {key}): {e}")
+
+        async def send_and_release(message) -> None:
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                await release()
+
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            await release()
+
+    def _lifespan_send(self, send: Send) -> Send:
+        async def lifespan_send(message) -> None:
+            if message["type"] == "lifespan.shutdown.complete":
+                try:
+                    await self.slots.drain()
+                except Exception as e:
+                    logger.error(f"Concurrency limiter could not return held slots: {e}")
+            await send(message)
+        return lifespan_send
+
+    async def _reject(self, send: Send, status: int, body: bytes, headers: Optional[list] = None) -> None:
+        raw_headers = [_JSON_CONTENT_TYPE, (b"content-length", str(len(body)).encode("latin-1"))]
+        if headers:
+            raw_headers.extend(headers)
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
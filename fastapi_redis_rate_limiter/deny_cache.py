@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from typing import Callable, Optional
+import time
+
+from .result import RateLimitResult
+
+
+class DenyCache:
+    """
+    In-process cache of clients that are currently blocked.
+
+    Once the backend denies a key, the denial is remembered until the
+    ``retry_after`` the backend reported, so further requests from that client
+    are answered locally without any network I/O. A cached denial is never
+    wrong: other workers can only consume more of the quota, not give it back.
+
+    The cache is bounded both in size (least recently blocked entries are
+    evicted first, so IP spraying cannot grow it without limit) and in how long
+    a single entry may live (``max_ttl`` seconds).
+    """
+    def __init__(self, max_size: int = 10000, max_ttl: float = 3600, clock: Callable[[], float] = time.monotonic):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[RateLimitResult]:
+        """
+        Returns the cached denial for ``key`` with its times adjusted to now,
+        or None if the key is not (or no longer) blocked.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, deadline, result = entry
+        now = self._clock()
+        if now >= deadline:
+            del self._entries[key]
+            return None
+        self.hits += 1
+        elapsed = now - stored_at
+        return result._replace(
+            retry_after=deadline - now,
+            reset_after=max(result.reset_after - elapsed, 0),
+        )
+
+    def add(self, key: str, result: RateLimitResult) -> None:
+        """
+        Remembers a denial until its retry time.
+        """
+        ttl = min(result.retry_after, self.max_ttl)
+        if ttl <= 0:
+            return
+        now = self._clock()
+        entries = self._entries
+        entries[key] = (now, now + ttl, result)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+from typing import Callable
+import math
+import time
+
+from .result import RateLimitResult
+
+
+class FallbackLimiter:
+    """
+    Per-process fixed-window limiter used while the backend is unavailable.
+
+    Each worker only sees its own share of the traffic, so it enforces
+    ``limit / workers`` (at least 1) to keep the fleet-wide total close to the
+    configured limit. At most ``max_keys`` counters are kept; the least
+    recently used one is dropped first.
+    """
+    def __init__(self, workers: int = 1, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+        self.workers = workers
+        self.max_keys = max_keys
+        self._clock = clock
+        self._counters = OrderedDict()
+        self.decisions = 0
+
+    def check(self, key: str, limit: int, window_ms: int) -> RateLimitResult:
+        self.decisions += 1
+        local_limit = max(1, limit // self.workers)
+        window = window_ms / 1000
+        now = self._clock()
+        index = math.floor(now / window)
+        reset_after = (index + 1) * window - now
+
+        counters = self._counters
+        entry = counters.get(key)
+        count = entry[1] if entry is not None and entry[0] == index else 0
+        if count >= local_limit:
+            counters.move_to_end(key)
+            return RateLimitResult(False, local_limit, 0, reset_after, reset_after)
+
+        counters[key] = (index, count + 1)
+        counters.move_to_end(key)
+        if len(counters) > self.max_keys:
+            counters.popitem(last=False)
+        return RateLimitResult(True, local_limit, local_limit - count - 1, reset_after, 0)
+
+    def __len__(self) -> int:
+        return len(self._counters)
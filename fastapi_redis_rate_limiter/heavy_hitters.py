@@ -0,0 +1,177 @@
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import time
+
+from .result import RateLimitResult
+
+logger = logging.getLogger(__name__)
+
+
+class CountMinSketch:
+    """
+    Approximate per-key counts in ``depth`` rows of ``width`` counters.
+
+    Estimates never undercount; with conservative updates they overcount by
+    at most about ``total / width`` with high probability. Memory is
+    ``width * depth`` 32-bit counters no matter how many keys are seen.
+    """
+    def __init__(self, width: int = 2048, depth: int = 4):
+        if width <= 0 or depth <= 0:
+            raise ValueError("width and depth must be positive")
+        self.width = width
+        self.depth = depth
+        self.clear()
+
+    def clear(self) -> None:
+        self._rows = [array("I", bytes(4 * self.width)) for _ in range(self.depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        # two hashes from one digest, combined per row (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        h1 = int.from_bytes(digest[:4], "little")
+        h2 = int.from_bytes(digest[4:], "little") | 1
+        width = self.width
+        return [(h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """
+        Counts ``key`` and returns its new estimate. Only the rows holding the
+        current minimum are raised (conservative update).
+        """
+        indexes = self._indexes(key)
+        rows = self._rows
+        estimate = min(row[index] for row, index in zip(rows, indexes)) + count
+        for row, index in zip(rows, indexes):
+            if row[index] < estimate:
+                row[index] = estimate
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+
+class TopK:
+    """
+    The ``k`` keys with the highest counts, fed by sketch estimates.
+
+    A key outside the table replaces the smallest entry once its estimate
+    exceeds it. The smallest count is cached as a floor and only recomputed
+    when a candidate beats the floor, so the many small keys of a spray
+    attack cost one comparison each.
+    """
+    def __init__(self, k: int = 100):
+        if k <= 0:
+            raise ValueError("k must be positive")
+        self.k = k
+        self.clear()
+
+    def clear(self) -> None:
+        self._counts: Dict[str, int] = {}
+        self._floor = 0
+
+    def offer(self, key: str, count: int) -> None:
+        counts = self._counts
+        if key in counts or len(counts) < self.k:
+            counts[key] = count
+            return
+        if count <= self._floor:
+            return
+        smallest = min(counts, key=counts.get)
+        if count > counts[smallest]:
+            del counts[smallest]
+            counts[key] = count
+            smallest = min(counts, key=counts.get)
+        self._floor = counts[smallest]
+
+    def items(self, n: int = None) -> List[Tuple[str, int]]:
+        ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+
+class HeavyHitterTracker:
+    """
+    In-process heavy-hitter detection in front of the backend.
+
+    Every request attempt is counted in a count-min sketch over tumbling
+    windows of ``window`` seconds. A key whose estimate reaches ``multiple``
+    times its limit (scaled to the tracker window) is put on a local block
+    list for ``block_duration`` seconds; its requests are denied without
+    touching the backend. Memory is fixed: the sketch, a top-``top_k`` table
+    and at most ``max_blocked`` block list entries (oldest dropped first).
+    """
+    def __init__(
+        self,
+        multiple: float = 10.0,
+        window: float = 60.0,
+        block_duration: float = 60.0,
+        width: int = 2048,
+        depth: int = 4,
+        top_k: int = 100,
+        max_blocked: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if multiple < 1:
+            raise ValueError("multiple must be at least 1")
+        self.multiple = multiple
+        self.window = window
+        self.block_duration = block_duration
+        self.max_blocked = max_blocked
+        self._clock = clock
+        self.sketch = CountMinSketch(width, depth)
+        self.top = TopK(top_k)
+        self._blocked = OrderedDict()
+        self._window_start = clock()
+        self.promotions = 0
+        self.blocked_requests = 0
+
+    def observe(self, key: str, limit: int, window_ms: int) -> Optional[RateLimitResult]:
+        """
+        Counts one request for ``key``. Returns a denial when the key is (or
+        has just become) blocked, otherwise None.
+        """
+        now = self._clock()
+        blocked = self._blocked
+        if blocked:
+            until = blocked.get(key)
+            if until is not None:
+                if now < until:
+                    self.blocked_requests += 1
+                    return RateLimitResult(False, limit, 0, until - now, until - now)
+                del blocked[key]
+
+        if now - self._window_start >= self.window:
+            self.sketch.clear()
+            self.top.clear()
+            self._window_start = now
+        count = self.sketch.add(key)
+        self.top.offer(key, count)
+        if count < self.multiple * limit * self.window * 1000 / window_ms:
+            return None
+
+        blocked[key] = now + self.block_duration
+        if len(blocked) > self.max_blocked:
+            blocked.popitem(last=False)
+        self.promotions += 1
+        logger.warning(f"Blocking heavy hitter {key} locally for {self.block_duration}s (~{count} requests in {now - self._window_start:.0f}s).")
+        self.blocked_requests += 1
+        return RateLimitResult(False, limit, 0, self.block_duration, self.block_duration)
+
+    def top_offenders(self, n: int = 10) -> List[Tuple[str, int]]:
+        """
+        The ``n`` keys with the most requests in the current window, with their
+        estimated counts.
+        """
+        return self.top.items(n)
+
+    def blocked(self) -> Dict[str, float]:
+        """
+        Currently blocked keys and the seconds left on each block.
+        """
+        now = self._clock()
+        return {key: until - now for key, until in self._blocked.items() if until > now}
+
+    def unblock(self, key: str) -> bool:
+        return self._blocked.pop(key, None) is not None
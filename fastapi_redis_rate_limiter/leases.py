@@ -0,0 +1,148 @@
+from typing import Callable, List, Optional, Tuple
+import time
+
+from .result import RateLimitResult
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "reset_at", "remote_remaining", "limit", "window_ms")
+
+    def __init__(self, tokens, expires_at, reset_at, remote_remaining, limit, window_ms):
+        self.tokens = tokens
+        self.expires_at = expires_at
+        self.reset_at = reset_at
+        self.remote_remaining = remote_remaining
+        self.limit = limit
+        self.window_ms = window_ms
+
+
+class LeasePool:
+    """
+    Approximate limiting with locally leased quota.
+
+    Instead of one backend call per request, a worker leases a block of
+    ``lease_size(limit)`` units for a key in one call and spends it locally,
+    going back to the backend only when the block is used up or expires. The
+    unspent units of an expired lease are handed back with the next refill
+    (see ``pop_expired``), so steady traffic still gets the whole allowance.
+
+    Error bound: with ``workers`` processes, each leases blocks of
+    ``limit * max_error / workers`` units per key and holds at most one block
+    per key at a time (the middleware runs one refill per key and makes
+    concurrent requests wait for it), so the quota held outside the backend
+    never exceeds ``max_error * limit``. A client may
+    therefore be denied up to ``max_error * limit`` requests early (quota
+    stranded in other workers' leases), and since leased units are spent up to
+    ``max_lease_age`` seconds after they were counted, rolling algorithms may
+    admit up to ``max_error * limit`` more within any single window than the
+    exact algorithm would. Leases never outlive the reset time the backend
+    reported, so a fixed window is never over-admitted.
+
+    Limits too small to lease at least two units are checked exactly, so low
+    limits keep their exact semantics.
+    """
+    def __init__(self, max_error: float = 0.1, workers: int = 1, max_lease_age: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        if not 0 < max_error <= 1:
+            raise ValueError("max_error must be in (0, 1]")
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+        self.max_error = max_error
+        self.workers = workers
+        self.max_lease_age = max_lease_age
+        self._clock = clock
+        self._leases = {}
+        self._expired = {}
+        self.local_hits = 0
+        self.leases_granted = 0
+
+    def lease_size(self, limit: int) -> int:
+        return int(limit * self.max_error / self.workers)
+
+    def applies_to(self, limit: int) -> bool:
+        """
+        True when ``limit`` is large enough to lease more than one unit at a time.
+        """
+        return self.lease_size(limit) > 1
+
+    def take(self, key: str) -> Optional[RateLimitResult]:
+        """
+        Spends one unit from a live lease for ``key``, or returns None if the
+        caller has to go to the backend.
+        """
+        lease = self._leases.get(key)
+        if lease is None:
+            return None
+        now = self._clock()
+        if lease.tokens <= 0 or now >= lease.expires_at:
+            del self._leases[key]
+            if lease.tokens > 0 and now < lease.reset_at:
+                # still counted in the current window: the next refill gives it back
+                self._expired[key] = (lease.tokens, lease.limit, lease.window_ms, lease.reset_at)
+            return None
+        lease.tokens -= 1
+        self.local_hits += 1
+        return RateLimitResult(True, lease.limit, lease.remote_remaining + lease.tokens, max(lease.reset_at - now, 0), 0)
+
+    def pop_expired(self, key: str) -> int:
+        """
+        Returns the unspent units of the expired lease for ``key`` that still
+        have to be refunded to the backend, and forgets them. Units of a window
+        that has reset since are not returned.
+        """
+        expired = self._expired.pop(key, None)
+        if expired is None or self._clock() >= expired[3]:
+            return 0
+        return expired[0]
+
+    def grant(self, key: str, reply, limit: int, window_ms: int) -> RateLimitResult:
+        """
+        Records a lease reply {granted, remaining, reset_ms, retry_ms} from the
+        backend, spends one unit of it for the current request and returns the
+        decision for that request.
+        """
+        granted, remaining, reset_ms, retry_ms = (int(v) for v in reply)
+        reset_after = reset_ms / 1000
+        if granted <= 0:
+            return RateLimitResult(False, limit, remaining, reset_after, retry_ms / 1000)
+
+        self.leases_granted += 1
+        now = self._clock()
+        tokens = granted - 1
+        lease = self._leases.get(key)
+        if lease is not None and now < lease.expires_at:
+            # a block granted while another is still live: merge them
+            tokens += lease.tokens
+        self._leases[key] = _Lease(
+            tokens,
+            now + min(self.max_lease_age, reset_after),
+            now + reset_after,
+            remaining,
+            limit,
+            window_ms,
+        )
+        return RateLimitResult(True, limit, remaining + tokens, reset_after, 0)
+
+    def drain(self) -> List[Tuple[str, int, int, int]]:
+        """
+        Empties the pool and returns (key, unspent units, limit, window_ms) for
+        every live lease and every expired one not refunded yet, so the unspent
+        quota can be given back.
+        """
+        now = self._clock()
+        unspent = [
+            (key, lease.tokens, lease.limit, lease.window_ms)
+            for key, lease in self._leases.items()
+            if lease.tokens > 0 and now < lease.expires_at
+        ]
+        unspent.extend(
+            (key, tokens, limit, window_ms)
+            for key, (tokens, limit, window_ms, reset_at) in self._expired.items()
+            if now < reset_at
+        )
+        self._leases.clear()
+        self._expired.clear()
+        return unspent
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
@@ -0,0 +1,246 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import logging
+import time
+
+from .circuit import CLOSED, HALF_OPEN, OPEN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PROMETHEUS_CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+CIRCUIT_STATES = (CLOSED, HALF_OPEN, OPEN)
+
+
+class RateLimitMetrics:
+    """
+    In-process counters for limiter decisions.
+
+    Counts allowed and denied decisions per policy, backend errors and
+    fallback decisions, and keeps a fixed-bucket histogram of backend call
+    latency. Recording is a dict increment, so it is cheap enough for the hot
+    path; the middleware skips it entirely when no metrics object is given.
+
+    ``tracer`` is an optional OpenTelemetry tracer (anything with
+    ``start_as_current_span``); when set, every backend decision runs in a
+    ``rate_limit.check`` span.
+
+    ``circuit_breaker`` is read when the metrics are exported, for its state
+    and its opened and short-circuited counts; the middleware attaches its
+    own breaker when none is given.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, tracer=None, circuit_breaker=None):
+        self.buckets = tuple(sorted(buckets))
+        self.tracer = tracer
+        self.circuit_breaker = circuit_breaker
+        self.decisions: Dict[Tuple[str, bool], int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.fallbacks: Dict[Tuple[str, str], int] = {}
+        self._latency_counts = [0] * (len(self.buckets) + 1)
+        self._latency_sum = 0.0
+        self.shed: Dict[str, int] = {}
+        self.adaptive_limit = None
+        self.adaptive_p99 = None
+        self.adaptive_adjustments = {"up": 0, "down": 0}
+
+    def record_decision(self, policy: str, allowed: bool) -> None:
+        key = (policy, allowed)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def record_error(self, policy: str, kind: str) -> None:
+        key = (policy, kind)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def record_fallback(self, policy: str, mode: str) -> None:
+        key = (policy, mode)
+        self.fallbacks[key] = self.fallbacks.get(key, 0) + 1
+
+    def record_shed(self, priority: str) -> None:
+        self.shed[priority] = self.shed.get(priority, 0) + 1
+
+    def record_adaptive_limit(self, old: float, new: float, p99: Optional[float]) -> None:
+        self.adaptive_limit = new
+        if p99 is not None:
+            self.adaptive_p99 = p99
+        if int(new) != int(old):
+            self.adaptive_adjustments["up" if new > old else "down"] += 1
+
+    def observe_backend_latency(self, seconds: float) -> None:
+        self._latency_counts[bisect_left(self.buckets, seconds)] += 1
+        self._latency_sum += seconds
+
+    @contextmanager
+    def span(self, policy: str, key: str):
+        """
+        Tracing span around one decision; yields the span, or None without a tracer.
+        """
+        if self.tracer is None:
+            yield None
+            return
+        with self.tracer.start_as_current_span(
+            "rate_limit.check",
+            attributes={"rate_limit.policy": policy, "rate_limit.key": key},
+        ) as span:
+            yield span
+
+    def snapshot(self) -> dict:
+        """
+        Current values as plain data, e.g. for a JSON status endpoint.
+        """
+        cumulative, total = [], 0
+        for count in self._latency_counts:
+            total += count
+            cumulative.append(total)
+        return {
+            "decisions": {f"{policy}:{'allowed' if allowed else 'denied'}": n for (policy, allowed), n in self.decisions.items()},
+            "errors": {f"{policy}:{kind}": n for (policy, kind), n in self.errors.items()},
+            "fallbacks": {f"{policy}:{mode}": n for (policy, mode), n in self.fallbacks.items()},
+            "shed": dict(self.shed),
+            "adaptive": {"limit": self.adaptive_limit, "p99": self.adaptive_p99, "adjustments": dict(self.adaptive_adjustments)},
+            "circuit": self.circuit_breaker.metrics() if self.circuit_breaker is not None else None,
+            "backend_latency": {
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+                "sum": self._latency_sum,
+                "count": total,
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP rate_limit_decisions_total Rate limit decisions by policy.",
+            "# TYPE rate_limit_decisions_total counter",
+        ]
+        for (policy, allowed), n in sorted(self.decisions.items()):
+            lines.append(f'rate_limit_decisions_total{{policy="{_escape(policy)}",decision="{"allowed" if allowed else "denied"}"}} {n}')
+        lines += [
+            "# HELP rate_limit_errors_total Failed or short-circuited backend calls.",
+            "# TYPE rate_limit_errors_total counter",
+        ]
+        for (policy, kind), n in sorted(self.errors.items()):
+            lines.append(f'rate_limit_errors_total{{policy="{_escape(policy)}",kind="{kind}"}} {n}')
+        lines += [
+            "# HELP rate_limit_fallbacks_total Decisions made without the backend.",
+            "# TYPE rate_limit_fallbacks_total counter",
+        ]
+        for (policy, mode), n in sorted(self.fallbacks.items()):
+            lines.append(f'rate_limit_fallbacks_total{{policy="{_escape(policy)}",mode="{mode}"}} {n}')
+        lines += [
+            "# HELP rate_limit_backend_latency_seconds Latency of backend calls.",
+            "# TYPE rate_limit_backend_latency_seconds histogram",
+        ]
+        total = 0
+        for bound, count in zip([*map(repr, self.buckets), "+Inf"], self._latency_counts):
+            total += count
+            lines.append(f'rate_limit_backend_latency_seconds_bucket{{le="{bound}"}} {total}')
+        lines.append(f"rate_limit_backend_latency_seconds_sum {self._latency_sum}")
+        lines.append(f"rate_limit_backend_latency_seconds_count {total}")
+        lines += [
+            "# HELP rate_limit_shed_total Requests shed by the adaptive limiter.",
+            "# TYPE rate_limit_shed_total counter",
+        ]
+        for priority, n in sorted(self.shed.items()):
+            lines.append(f'rate_limit_shed_total{{priority="{_escape(priority)}"}} {n}')
+        if self.adaptive_limit is not None:
+            lines += [
+                "# HELP rate_limit_adaptive_limit Current adaptive limit on requests in flight.",
+                "# TYPE rate_limit_adaptive_limit gauge",
+                f"rate_limit_adaptive_limit {self.adaptive_limit}",
+            ]
+        if self.adaptive_p99 is not None:
+            lines += [
+                "# HELP rate_limit_adaptive_latency_p99_seconds Handler p99 latency of the last measured adaptive window.",
+                "# TYPE rate_limit_adaptive_latency_p99_seconds gauge",
+                f"rate_limit_adaptive_latency_p99_seconds {self.adaptive_p99}",
+            ]
+        lines += [
+            "# HELP rate_limit_adaptive_adjustments_total Changes of the adaptive limit.",
+            "# TYPE rate_limit_adaptive_adjustments_total counter",
+        ]
+        for direction, n in self.adaptive_adjustments.items():
+            lines.append(f'rate_limit_adaptive_adjustments_total{{direction="{direction}"}} {n}')
+        if self.circuit_breaker is not None:
+            breaker = self.circuit_breaker.metrics()
+            lines += [
+                "# HELP rate_limit_circuit_state Circuit breaker state; 1 for the current one.",
+                "# TYPE rate_limit_circuit_state gauge",
+            ]
+            for state in CIRCUIT_STATES:
+                lines.append(f'rate_limit_circuit_state{{state="{state}"}} {int(breaker["state"] == state)}')
+            lines += [
+                "# HELP rate_limit_circuit_opened_total Times the circuit breaker opened.",
+                "# TYPE rate_limit_circuit_opened_total counter",
+                f"rate_limit_circuit_opened_total {breaker['times_opened']}",
+                "# HELP rate_limit_circuit_short_circuited_total Backend calls refused while the circuit was open.",
+                "# TYPE rate_limit_circuit_short_circuited_total counter",
+                f"rate_limit_circuit_short_circuited_total {breaker['short_circuited']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_app(metrics: RateLimitMetrics):
+    """
+    A minimal ASGI app serving ``metrics`` for Prometheus to scrape, e.g.
+    ``app.mount("/metrics", prometheus_app(metrics))``.
+    """
+    async def app(scope, receive, send) -> None:
+        body = metrics.render_prometheus().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", PROMETHEUS_CONTENT_TYPE), (b"content-length", str(len(body)).encode("latin-1"))],
+        })
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+class DenialLog:
+    """
+    Aggregated logging of denied requests.
+
+    Instead of a warning per 429, denials are counted and one summary line is
+    logged at most every ``interval`` seconds, naming the ``top`` most denied
+    clients. At most ``max_clients`` clients are tracked per interval, so an
+    attack spread over many addresses cannot grow it without bound.
+    """
+    def __init__(self, interval: float = 10.0, top: int = 5, max_clients: int = 1000, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.top = top
+        self.max_clients = max_clients
+        self._clock = clock
+        self._started = clock()
+        self._total = 0
+        self._clients: Dict[str, int] = {}
+
+    def record(self, client_identifier: str) -> None:
+        self._total += 1
+        clients = self._clients
+        if client_identifier in clients:
+            clients[client_identifier] += 1
+        elif len(clients) < self.max_clients:
+            clients[client_identifier] = 1
+        now = self._clock()
+        if now - self._started >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: float = None) -> None:
+        """
+        Logs the summary for the current interval, if anything was denied.
+        """
+        now = self._clock() if now is None else now
+        if self._total:
+            top = sorted(self._clients.items(), key=lambda item: item[1], reverse=True)[:self.top]
+            logger.warning(
+                f"Rate limit exceeded {self._total} times in the last {now - self._started:.0f}s; "
+                f"top clients: {', '.join(f'{client} ({count})' for client, count in top)}."
+            )
+        self._started = now
+        self._total = 0
+        self._clients = {}
@@ -1,101 +1,479 @@
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
-from starlette.types import ASGIApp
-import redis.asyncio as redis
-import time
-import logging
-
-# logging configuration and indian time format and must print the filename and line number
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-logger = logging.getLogger(__name__)
-
-logger.info("processing fastapi_redis_rate_limiter middleware")
-
-class RedisRateLimitMiddleware(BaseHTTPMiddleware):
-    """
-    A FastAPI middleware for distributed rate limiting using Redis.
-    """
-    def __init__(
-        self,
-        app: ASGIApp,
-        redis_client: redis.Redis,
-        rate_limit: int = 5,
-        time_window: int = 60,
-        exceeded_response: dict = None,
-        ip_extractor: callable = None,
-    ):
-        super().__init__(app)
-        self.redis_client = redis_client
-        self.rate_limit = rate_limit
-        self.time_window = time_window
-        self.exceeded_response = exceeded_response or {"detail": "Rate limit exceeded"}
-        self.ip_extractor = ip_extractor if ip_extractor else self._default_ip_extractor
-        logger.info(
-            f"RedisRateLimitMiddleware initialized: "
-            f"Limit={self.rate_limit} requests per {self.time_window} seconds."
-        )
-
-    async def _default_ip_extractor(self, request: Request) -> str:
-        """
-        Default method to extract client IP from request.
-        Considers X-Forwarded-For if present, otherwise uses request.client.host.
-        """
-        x_forwarded_for = request.headers.get("X-Forwarded-For")
-        if x_forwarded_for:
-            return x_forwarded_for.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
-
-    async def is_rate_limited(self, client_identifier: str) -> bool:
-        """
-        Checks if the client is rate-limited using a fixed-window counter in Redis.
-        """
-        key = f"rate_limit:{client_identifier}"
-
-        try:
-            pipe = self.redis_client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, self.time_window)
-
-            count, _ = await pipe.execute()
-
-            if count > self.rate_limit:
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Error interacting with Redis for rate limiting (key: {key}): {e}")
-            raise Exception("Rate limiting service unavailable.")
-
-
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        """
-        The main middleware dispatch method.
-        """
-        if request.url.path == "/health": # Optionally bypass rate limiting for health checks
-            return await call_next(request)
-
-        client_identifier = await self.ip_extractor(request)
-
-        try:
-            if await self.is_rate_limited(client_identifier):
-                retry_after = await self.redis_client.ttl(f"rate_limit:{client_identifier}")
-                if retry_after == -1: # No TTL set (shouldn't happen with expire)
-                    retry_after = self.time_window # Fallback
-
-                response = JSONResponse(
-                    status_code=429,
-                    content=self.exceeded_response
-                )
-                response.headers["Retry-After"] = str(retry_after)
-                logger.warning(f"Rate limit exceeded for {client_identifier}. Retrying after {retry_after}s.")
-                return response
-        except Exception as e:
-            # Catch any exception from is_rate_limited (e.g., Redis down)
-            logger.error(f"Rate limiting middleware error: {e}")
-            return JSONResponse(
-                status_code=503,
-                content={"detail": "Rate limiting service error or unavailable."}
-            )
-
-        response = await call_next(request)
-        return response
\ No newline at end of file
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Sequence, Tuple, Union
+import redis.asyncio as redis
+import asyncio
+import json
+import math
+import time
+import logging
+
+from .adaptive import AdaptiveLimiter
+from .algorithms import RateLimitAlgorithm, get_algorithm
+from .backends import RateLimitBackend, RedisBackend
+from .batching import RequestBatcher
+from .circuit import CircuitBreaker, CircuitOpenError
+from .client_ip import ClientIPExtractor
+from .deny_cache import DenyCache
+from .fallback import FallbackLimiter
+from .heavy_hitters import HeavyHitterTracker
+from .leases import LeasePool
+from .metrics import DenialLog, RateLimitMetrics
+from .policies import Policy, PolicyTable
+from .result import RateLimitResult
+
+# logging configuration and indian time format and must print the filename and line number
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+logger = logging.getLogger(__name__)
+
+logger.info("processing fastapi_redis_rate_limiter middleware")
+
+_JSON_CONTENT_TYPE = (b"content-type", b"application/json")
+FAILURE_MODES = ("closed", "open", "local")
+_UNAVAILABLE_BODY = json.dumps({"detail": "Rate limiting service error or unavailable."}).encode("utf-8")
+_SHED_BODY = json.dumps({"detail": "Server overloaded, retry later."}).encode("utf-8")
+
+HEADER_STYLES = ("draft", "legacy", "both", None)
+_HEADER_NAMES = {
+    # IETF draft "RateLimit header fields for HTTP"
+    "draft": (b"ratelimit-limit", b"ratelimit-remaining", b"ratelimit-reset"),
+    "legacy": (b"x-ratelimit-limit", b"x-ratelimit-remaining", b"x-ratelimit-reset"),
+}
+_HEADER_NAMES["both"] = _HEADER_NAMES["draft"] + _HEADER_NAMES["legacy"]
+_RETRY_AFTER = b"retry-after"
+# header values are small integers; encode the common ones once
+_ENCODED_INTS = tuple(str(i).encode("latin-1") for i in range(4096))
+
+
+def _encode_int(value: int) -> bytes:
+    if 0 <= value < len(_ENCODED_INTS):
+        return _ENCODED_INTS[value]
+    return str(value).encode("latin-1")
+
+
+def _with_headers(send: Send, headers: list) -> Send:
+    """
+    Wraps ``send`` so ``headers`` are appended to the response start message.
+    """
+    async def send_with_headers(message) -> None:
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", ()), *headers]}
+        await send(message)
+    return send_with_headers
+
+
+class RedisRateLimitMiddleware:
+    """
+    A FastAPI middleware for distributed rate limiting using Redis.
+
+    Implemented as a plain ASGI middleware: allowed requests are handed to the
+    wrapped app with the original ``receive``/``send`` callables, so streaming
+    responses and background tasks behave exactly as without the middleware.
+
+    Every rate limited response carries RateLimit-Limit, RateLimit-Remaining
+    and RateLimit-Reset (``rate_limit_headers="draft"``), their X-RateLimit-*
+    equivalents (``"legacy"``), or both (the default); ``None`` turns them off.
+    The values come from the decision's own backend reply and describe the
+    most restrictive tier; Reset is in seconds from now.
+
+    With ``adaptive`` set, requests that pass the rate limit also have to fit
+    under an :class:`AdaptiveLimiter`, which tracks handler latency and errors
+    and sheds lower ``Policy.priority`` classes first with a 503.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        redis_client: redis.Redis = None,
+        rate_limit: int = 5,
+        time_window: int = 60,
+        exceeded_response: dict = None,
+        ip_extractor: callable = None,
+        limit_websockets: bool = False,
+        algorithm: Union[str, RateLimitAlgorithm] = None,
+        deny_cache: DenyCache = None,
+        batcher: RequestBatcher = None,
+        leases: LeasePool = None,
+        backend: RateLimitBackend = None,
+        circuit_breaker: CircuitBreaker = None,
+        failure_mode: str = "closed",
+        fallback: FallbackLimiter = None,
+        policies: Sequence[Policy] = None,
+        tiers: Sequence[Tuple[int, int]] = None,
+        rate_limit_headers: str = "both",
+        metrics: RateLimitMetrics = None,
+        denial_log: DenialLog = None,
+        heavy_hitters: HeavyHitterTracker = None,
+        client_ip: ClientIPExtractor = None,
+        adaptive: AdaptiveLimiter = None,
+    ):
+        if backend is None:
+            if redis_client is None:
+                raise ValueError("RedisRateLimitMiddleware needs a redis_client or a backend")
+            backend = RedisBackend(redis_client)
+        self.app = app
+        self.redis_client = redis_client
+        self.backend = backend
+        self.rate_limit = rate_limit
+        self.time_window = time_window
+        self.exceeded_response = exceeded_response or {"detail": "Rate limit exceeded"}
+        self.ip_extractor = ip_extractor
+        # X-Forwarded-For is only believed when it arrives through a trusted proxy
+        self.client_ip = client_ip or ClientIPExtractor()
+        self.limit_websockets = limit_websockets
+        self.algorithm = get_algorithm(algorithm)
+        self.deny_cache = deny_cache
+        self.batcher = batcher
+        if self.batcher is not None:
+            self.batcher.bind(self._check_batch)
+        self.leases = leases
+        # one pending refill per leased key; concurrent requests wait for it
+        self._lease_refills = {}
+        self.circuit_breaker = circuit_breaker
+        self.failure_mode = failure_mode
+        self.tiers = tiers
+        if rate_limit_headers not in HEADER_STYLES:
+            raise ValueError(f"rate_limit_headers must be one of {HEADER_STYLES}, got {rate_limit_headers!r}")
+        self._header_names = _HEADER_NAMES.get(rate_limit_headers, ())
+        self.metrics = metrics
+        if metrics is not None and metrics.circuit_breaker is None:
+            metrics.circuit_breaker = circuit_breaker
+        # one aggregated warning per interval instead of one per 429
+        self.denial_log = denial_log or DenialLog()
+        self.heavy_hitters = heavy_hitters
+        self.adaptive = adaptive
+        if adaptive is not None and adaptive.metrics is None:
+            adaptive.metrics = metrics
+        self.policy_table = self._build_policy_table(policies or ())
+        self.fallback = fallback
+        if self.fallback is None and any(p.failure_mode == "local" for p in self._all_policies()):
+            # the middleware cannot know how many workers share the limit
+            logger.warning(
+                "failure_mode='local' without a fallback limiter: each worker will allow the full limit "
+                "while the backend is down; pass fallback=FallbackLimiter(workers=N) for N workers."
+            )
+            self.fallback = FallbackLimiter()
+        # The 429 body never changes, so encode it once instead of per denial.
+        self._exceeded_body = json.dumps(self.exceeded_response).encode("utf-8")
+        tiers = self.policy_table.default.tiers or ((self.rate_limit, self.time_window),)
+        logger.info(
+            f"RedisRateLimitMiddleware initialized: "
+            f"Limit={', '.join(f'{limit} requests per {window} seconds' for limit, window in tiers)} "
+            f"({self.algorithm.name})."
+        )
+
+    def _build_policy_table(self, policies: Sequence[Policy]) -> PolicyTable:
+        default = Policy(
+            path="/*",
+            rate_limit=self.rate_limit,
+            time_window=self.time_window,
+            tiers=self.tiers,
+            key_func=self.ip_extractor,
+            failure_mode=self.failure_mode,
+            name="default",
+        )
+        policies = list(policies)
+        if not any(p.path == "/health" for p in policies):
+            # health checks have always bypassed rate limiting
+            policies.append(Policy(path="/health", exempt=True))
+        for policy in [default] + policies:
+            if policy.failure_mode is not None and policy.failure_mode not in FAILURE_MODES:
+                raise ValueError(f"failure_mode must be one of {FAILURE_MODES}, got {policy.failure_mode!r}")
+        return PolicyTable(policies, default)
+
+    def _all_policies(self) -> list:
+        return [self.policy_table.default] + self.policy_table.policies
+
+    def _key(self, client_identifier: str, policy: Policy) -> str:
+        if policy is self.policy_table.default:
+            return self.algorithm.key(client_identifier)
+        return self.algorithm.key(client_identifier, policy.name)
+
+    async def check(self, client_identifier: str, policy: Policy = None) -> RateLimitResult:
+        """
+        Counts one request for the client and returns the decision together with
+        the remaining quota and reset time, all from a single script call.
+        Clients held in the deny cache or blocked as heavy hitters are answered
+        without calling Redis.
+        """
+        if policy is None:
+            policy = self.policy_table.default
+        key = self._key(client_identifier, policy)
+        if self.heavy_hitters is not None:
+            blocked = self.heavy_hitters.observe(key, policy.rate_limit, policy.window_ms)
+            if blocked is not None:
+                return blocked
+        if self.deny_cache is not None:
+            cached = self.deny_cache.get(key)
+            if cached is not None:
+                return cached
+
+        metrics = self.metrics
+        try:
+            if metrics is None:
+                result = await self._decide(key, policy)
+            else:
+                with metrics.span(policy.name, key) as span:
+                    result = await self._decide(key, policy)
+                    if span is not None:
+                        span.set_attribute("rate_limit.allowed", result.allowed)
+        except CircuitOpenError:
+            if metrics is not None:
+                metrics.record_error(policy.name, "circuit_open")
+            return self._degraded(key, policy)
+        except Exception as e:
+            if metrics is not None:
+                metrics.record_error(policy.name, "backend")
+            logger.error(f"Error interacting with Redis for rate limiting (key: {key}): {e}")
+            return self._degraded(key, policy)
+
+        if not result.allowed and self.deny_cache is not None:
+            self.deny_cache.add(key, result)
+        return result
+
+    async def _decide(self, key: str, policy: Policy) -> RateLimitResult:
+        """
+        Gets a decision for one request: from a local lease when leasing applies,
+        otherwise from the backend, coalesced with other checks when batching.
+        """
+        if policy.tiers_ms is not None:
+            # all tiers in one atomic call; leases and batching cover single limits only
+            return await self._call_backend(self.backend.check_tiers, self.algorithm, key, policy.tiers_ms)
+
+        limit, window_ms = policy.rate_limit, policy.window_ms
+        if self.leases is not None and self.leases.applies_to(limit):
+            return await self._leased(key, limit, window_ms)
+
+        if self.batcher is not None:
+            return await self._call_backend(self.batcher.submit, (key, limit, window_ms))
+        return await self._call_backend(self.backend.check, self.algorithm, key, limit, window_ms)
+
+    async def _leased(self, key: str, limit: int, window_ms: int) -> RateLimitResult:
+        """
+        Spends one unit of the local lease for ``key``, refilling it from the
+        backend when it is used up. Only one refill per key is in flight at a
+        time: requests arriving meanwhile wait for it and spend from the new
+        lease, or share its denial, instead of leasing blocks of their own.
+        """
+        while True:
+            result = self.leases.take(key)
+            if result is not None:
+                return result
+            refill = self._lease_refills.get(key)
+            if refill is None:
+                break
+            # shielded: a cancelled waiter must not cancel the refill for the others
+            denial = await asyncio.shield(refill)
+            if denial is not None:
+                return denial
+
+        refill = asyncio.get_running_loop().create_future()
+        self._lease_refills[key] = refill
+        try:
+            expired = self.leases.pop_expired(key)
+            if expired:
+                await self._call_backend(self.backend.refund, self.algorithm, key, expired, limit, window_ms)
+            reply = await self._call_backend(self.backend.lease, self.algorithm, key, self.leases.lease_size(limit), limit, window_ms)
+            result = self.leases.grant(key, reply, limit, window_ms)
+            refill.set_result(None if result.allowed else result)
+            return result
+        except Exception as e:
+            refill.set_exception(e)
+            # retrieved here, as there may be no waiters to do it
+            refill.exception()
+            raise
+        finally:
+            del self._lease_refills[key]
+            if not refill.done():
+                refill.set_result(None)
+
+    async def _call_backend(self, fn, *args):
+        if self.metrics is None:
+            return await self._guarded_call(fn, *args)
+        started = time.perf_counter()
+        result = await self._guarded_call(fn, *args)
+        self.metrics.observe_backend_latency(time.perf_counter() - started)
+        return result
+
+    async def _guarded_call(self, fn, *args):
+        if self.circuit_breaker is None:
+            return await fn(*args)
+        return await self.circuit_breaker.call(fn, *args)
+
+    def _degraded(self, key: str, policy: Policy) -> RateLimitResult:
+        """
+        Decision used when the backend failed or the circuit is open, following
+        the policy's ``failure_mode``: "closed" raises (the request gets a 503),
+        "open" lets the request through, "local" applies the per-process
+        fallback limiter.
+        """
+        if self.metrics is not None and policy.failure_mode != "closed":
+            self.metrics.record_fallback(policy.name, policy.failure_mode)
+        if policy.failure_mode == "local":
+            return self.fallback.check(key, policy.rate_limit, policy.window_ms)
+        if policy.failure_mode == "open":
+            return RateLimitResult(True, policy.rate_limit, policy.rate_limit, 0, 0)
+        raise Exception("Rate limiting service unavailable.")
+
+    async def _check_batch(self, items: list, counts: list) -> list:
+        """
+        Runs a coalesced batch of (key, limit, window_ms) checks on the backend.
+        """
+        return await self.backend.check_batch(self.algorithm, items, counts)
+
+    async def is_rate_limited(self, client_identifier: str) -> bool:
+        """
+        Checks if the client is rate-limited using the configured algorithm in Redis.
+        """
+        return not (await self.check(client_identifier)).allowed
+
+    async def shutdown(self) -> None:
+        """
+        Flushes queued batched checks, returns unspent leased quota to Redis and
+        logs the pending denial summary. Runs automatically when the app's
+        lifespan shutdown completes.
+        """
+        self.denial_log.flush()
+        if self.batcher is not None:
+            await self.batcher.drain()
+        if self.leases is not None:
+            unspent = self.leases.drain()
+            if not unspent:
+                return
+            try:
+                await asyncio.gather(*(
+                    self.backend.refund(self.algorithm, key, tokens, limit, window_ms)
+                    for key, tokens, limit, window_ms in unspent
+                ))
+            except Exception as e:
+                logger.error(f"Error returning leased rate limit quota to Redis: {e}")
+                return
+            logger.info(f"Returned {sum(u[1] for u in unspent)} leased units for {len(unspent)} keys.")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        The main ASGI entry point.
+        """
+        if not self.policy_table.compiled:
+            # Starlette puts the application in the scope, so route names resolve here
+            self.policy_table.compile(scope.get("app"))
+
+        scope_type = scope["type"]
+        if scope_type == "lifespan":
+            await self.app(scope, receive, self._lifespan_send(send))
+            return
+        if scope_type != "http" and not (scope_type == "websocket" and self.limit_websockets):
+            # websockets pass straight through unless opted in
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.policy_table.match(scope.get("method", "GET"), scope["path"])
+        if policy.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        if policy.key_func is None:
+            client_identifier = self.client_ip(scope)
+        else:
+            # Custom extractors keep receiving a Request, as they always have.
+            client_identifier = await policy.key_func(Request(scope, receive))
+
+        adaptive = self.adaptive if scope_type == "http" else None
+        if adaptive is None:
+            send = await self._check_request(scope, send, client_identifier, policy)
+            if send is not None:
+                await self.app(scope, receive, send)
+            return
+
+        if not adaptive.try_acquire(adaptive.priority_of(client_identifier, policy.priority)):
+            # shed before the backend is asked: no round trip, and no quota spent on a request never served
+            await self._reject(scope, send, 503, _SHED_BODY, [(_RETRY_AFTER, b"1")])
+            return
+        try:
+            send = await self._check_request(scope, send, client_identifier, policy)
+        except BaseException:
+            adaptive.cancel()
+            raise
+        if send is None:
+            adaptive.cancel()
+            return
+        await self._call_adaptive(scope, receive, send)
+
+    async def _check_request(self, scope: Scope, send: Send, client_identifier: str, policy: Policy):
+        """
+        Applies the rate limit. Returns the ``send`` to run the app with, or
+        None once the request has been rejected.
+        """
+        try:
+            result = await self.check(client_identifier, policy)
+        except Exception as e:
+            # Catch any exception from check (e.g., Redis down)
+            logger.error(f"Rate limiting middleware error: {e}")
+            await self._reject(scope, send, 503, _UNAVAILABLE_BODY)
+            return None
+
+        if self.metrics is not None:
+            self.metrics.record_decision(policy.name, result.allowed)
+        headers = self._rate_limit_headers(result)
+        if not result.allowed:
+            retry_after = math.ceil(result.retry_after)
+            self.denial_log.record(client_identifier)
+            headers.append((_RETRY_AFTER, _encode_int(retry_after)))
+            await self._reject(scope, send, 429, self._exceeded_body, headers)
+            return None
+
+        if headers and scope["type"] == "http":
+            send = _with_headers(send, headers)
+        return send
+
+    async def _call_adaptive(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Runs an admitted request, measuring the app's latency and errors.
+        """
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.adaptive.release(time.perf_counter() - started, status >= 500)
+
+    def _rate_limit_headers(self, result: RateLimitResult) -> list:
+        """
+        Encodes the RateLimit headers for a decision.
+        """
+        names = self._header_names
+        if not names:
+            return []
+        values = (_encode_int(result.limit), _encode_int(result.remaining), _encode_int(math.ceil(result.reset_after)))
+        return list(zip(names, values * (len(names) // 3)))
+
+    def _lifespan_send(self, send: Send) -> Send:
+        async def lifespan_send(message) -> None:
+            if message["type"] == "lifespan.shutdown.complete":
+                await self.shutdown()
+            await send(message)
+        return lifespan_send
+
+    async def _reject(self, scope: Scope, send: Send, status: int, body: bytes, headers: list = None) -> None:
+        """
+        Sends a rejection directly on the ASGI channel, without building a Response object.
+        """
+        if scope["type"] == "websocket":
+            # Closing before accept makes the server answer the handshake with a 403.
+            await send({"type": "websocket.close", "code": 1008})
+            return
+
+        raw_headers = [
+            _JSON_CONTENT_TYPE,
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+        if headers:
+            raw_headers.extend(headers)
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,190 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANY_METHOD = "*"
+
+
+class Policy:
+    """
+    One entry of the policy table.
+
+    Matches requests by ``path`` pattern and optional ``methods``, or by the
+    ``route`` name of a Starlette/FastAPI route (resolved to its path and
+    methods when the table is compiled). Patterns are literal paths, may
+    contain ``{param}`` segments, and may end in ``/*`` to cover everything
+    below a prefix (including the prefix itself).
+
+    ``rate_limit``, ``time_window``, ``key_func``, ``failure_mode`` and
+    ``priority`` left as None inherit the middleware's settings. ``tiers``
+    replaces the single limit with several (rate_limit, time_window) pairs
+    enforced together, e.g. a burst, a sustained and a daily quota; a policy
+    that sets neither ``tiers`` nor its own limit inherits the middleware's
+    tiers. Exempt policies skip rate limiting entirely. ``priority`` names
+    the route's load shedding class (see ``adaptive.py``). Policies with the
+    same ``name`` share one counter per client; by default every policy
+    counts separately.
+    """
+    def __init__(
+        self,
+        path: str = None,
+        methods: Iterable[str] = None,
+        route: str = None,
+        rate_limit: int = None,
+        time_window: int = None,
+        tiers: Sequence[Tuple[int, int]] = None,
+        key_func: Callable = None,
+        exempt: bool = False,
+        failure_mode: str = None,
+        name: str = None,
+        priority: str = None,
+    ):
+        if (path is None) == (route is None):
+            raise ValueError("A policy needs exactly one of path or route")
+        self.path = path
+        self.methods = tuple(sorted(m.upper() for m in methods)) if methods else None
+        self.route = route
+        self.rate_limit = rate_limit
+        self.time_window = time_window
+        self.tiers = _normalize_tiers(tiers)
+        self.key_func = key_func
+        self.exempt = exempt
+        self.failure_mode = failure_mode
+        self.priority = priority
+        self.name = name or f"{','.join(self.methods or (ANY_METHOD,))}:{path or route}"
+        self.window_ms = None
+        self.tiers_ms = None
+
+    def inherit(self, default: "Policy") -> None:
+        """
+        Fills unset settings from the middleware-wide default policy.
+        """
+        own_limit = self.rate_limit is not None or self.time_window is not None
+        if self.tiers is None and not own_limit:
+            self.tiers = default.tiers
+        if self.tiers is not None:
+            # the shortest tier stands in for the policy where a single limit
+            # is needed, e.g. by the local fallback limiter
+            self.rate_limit, self.time_window = self.tiers[0]
+            self.tiers_ms = tuple((limit, int(window * 1000)) for limit, window in self.tiers)
+        for attr in ("rate_limit", "time_window", "key_func", "failure_mode", "priority"):
+            if getattr(self, attr) is None:
+                setattr(self, attr, getattr(default, attr))
+        self.window_ms = int(self.time_window * 1000)
+
+    def __repr__(self) -> str:
+        return f"Policy({self.name!r}, rate_limit={self.rate_limit}, time_window={self.time_window}, exempt={self.exempt})"
+
+
+def _normalize_tiers(tiers: Optional[Sequence[Tuple[int, int]]]) -> Optional[tuple]:
+    if tiers is None:
+        return None
+    tiers = tuple(sorted(((int(limit), window) for limit, window in tiers), key=lambda tier: tier[1]))
+    if not tiers:
+        raise ValueError("tiers must not be empty")
+    if any(limit <= 0 or window <= 0 for limit, window in tiers):
+        raise ValueError("Tier limits and windows must be positive")
+    windows = [window for _, window in tiers]
+    if len(set(windows)) != len(windows):
+        raise ValueError("Each tier needs its own time_window")
+    return tiers
+
+
+class _Node:
+    __slots__ = ("literal", "param", "exact", "wildcard")
+
+    def __init__(self):
+        self.literal: Dict[str, "_Node"] = {}
+        self.param: Optional["_Node"] = None
+        self.exact: Dict[str, Policy] = {}
+        self.wildcard: Dict[str, Policy] = {}
+
+
+def _segments(path: str) -> List[str]:
+    path = path.strip("/")
+    return path.split("/") if path else []
+
+
+def _pick(policies: Dict[str, Policy], method: str) -> Optional[Policy]:
+    if not policies:
+        return None
+    return policies.get(method) or policies.get(ANY_METHOD)
+
+
+class PolicyTable:
+    """
+    Policy entries compiled into a path trie with per-method dispatch.
+
+    Lookup walks one trie node per path segment, preferring literal segments
+    over ``{param}`` segments over ``/*`` prefixes, and an exact method over
+    any method; requests matching nothing get the default policy. The
+    middleware compiles the table once, at lifespan startup or on the first
+    request, when route names can be resolved against the application.
+    """
+    def __init__(self, policies: Sequence[Policy], default: Policy):
+        self.policies = list(policies)
+        self.default = default
+        self.default.inherit(default)
+        self._root = None
+
+    @property
+    def compiled(self) -> bool:
+        return self._root is not None
+
+    def compile(self, app=None) -> None:
+        routes = {}
+        for route in getattr(app, "routes", None) or ():
+            name = getattr(route, "name", None)
+            if name and hasattr(route, "path"):
+                routes.setdefault(name, route)
+
+        root = _Node()
+        for policy in self.policies:
+            policy.inherit(self.default)
+            path, methods = policy.path, policy.methods
+            if policy.route is not None:
+                route = routes.get(policy.route)
+                if route is None:
+                    logger.warning(f"Rate limit policy for unknown route {policy.route!r} ignored.")
+                    continue
+                path = route.path
+                methods = methods or tuple(sorted(getattr(route, "methods", None) or ())) or None
+            self._insert(root, path, methods or (ANY_METHOD,), policy)
+        self._root = root
+
+    def _insert(self, root: _Node, path: str, methods: Sequence[str], policy: Policy) -> None:
+        node = root
+        segments = _segments(path)
+        wildcard = bool(segments) and segments[-1] == "*"
+        if wildcard:
+            segments = segments[:-1]
+        for segment in segments:
+            if segment.startswith("{") and segment.endswith("}"):
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                node = node.literal.setdefault(segment, _Node())
+        target = node.wildcard if wildcard else node.exact
+        for method in methods:
+            target.setdefault(method, policy)
+
+    def match(self, method: str, path: str) -> Policy:
+        if self._root is None:
+            self.compile()
+        return self._match(self._root, _segments(path), 0, method) or self.default
+
+    def _match(self, node: _Node, segments: List[str], index: int, method: str) -> Optional[Policy]:
+        if index == len(segments):
+            return _pick(node.exact, method) or _pick(node.wildcard, method)
+        child = node.literal.get(segments[index])
+        if child is not None:
+            found = self._match(child, segments, index + 1, method)
+            if found is not None:
+                return found
+        if node.param is not None:
+            found = self._match(node.param, segments, index + 1, method)
+            if found is not None:
+                return found
+        return _pick(node.wildcard, method)
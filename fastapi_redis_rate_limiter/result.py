@@ -0,0 +1,12 @@
+from typing import NamedTuple
+
+
+class RateLimitResult(NamedTuple):
+    """
+    Outcome of a single rate limit decision, as returned by one backend round trip.
+    """
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the quota is fully restored
+    retry_after: float  # seconds until a denied client may try again (0 when allowed)
@@ -0,0 +1,422 @@
+"""
+Server-side Lua scripts used by the middleware.
+
+Scripts are registered with ``redis_client.register_script`` so redis-py calls
+them by EVALSHA and transparently falls back to loading the source on NOSCRIPT.
+
+Every algorithm is built from two Lua functions:
+
+    check(key, limit, window, now, cost) -> allowed, remaining, reset, retry, state
+    commit(key, limit, window, now, cost, state)
+
+``check`` only reads, ``commit`` writes the state ``check`` computed. The
+shared ``_DRIVER`` below runs the two back to back, so a decision and its
+bookkeeping are one atomic call. All durations are in milliseconds and
+``now`` comes from the Redis server clock, so workers never disagree on time.
+
+A script is called with:
+    KEYS[1] = state key
+    ARGV[1] = cost, ARGV[2] = limit, ARGV[3] = window in milliseconds
+and replies {allowed (0/1), remaining, reset in ms, retry after in ms}.
+Each key holds a constant amount of data no matter how many requests it sees.
+
+Algorithms also define ``refund(key, limit, window, now, amount)``, which
+gives back quota taken earlier; it is used to return unspent leases (see
+``leases.py``). The lease driver takes up to ARGV[1] units at once, as many
+as the quota allows, and replies {granted, remaining, reset, retry after}.
+The refund driver gives back ARGV[1] units and replies with nothing useful.
+
+The batch driver runs many decisions in one call (see ``batching.py``):
+    KEYS[i] = distinct state keys
+    ARGV[3i-2] = number of requests for KEYS[i], ARGV[3i-1] = limit, ARGV[3i] = window
+and replies with the four values above for every request, flattened, in order.
+
+The tiered driver decides one request against several limits at once:
+    KEYS[i] = state key of tier i (all sharing one hash tag)
+    ARGV[1] = cost, ARGV[2i] = limit of tier i, ARGV[2i+1] = window of tier i
+Every tier is checked first and all of them are committed only if every tier
+allows the request, so a request denied by one tier costs nothing in the
+others. The reply is {tier, allowed, remaining, reset, retry after} for the
+most restrictive tier: the denying tier with the longest retry, or, when
+allowed, the tier with the least quota left.
+"""
+
+# Fixed-window counter: a plain integer that expires at the end of the window.
+# The expiry is only set when the key has none, so a client that keeps
+# hammering cannot push its own window end further out.
+FIXED_WINDOW = """
+local function check(key, limit, window, now, cost)
+    local count = tonumber(redis.call('GET', key)) or 0
+    local ttl = redis.call('PTTL', key)
+    if ttl < 0 then
+        ttl = window
+    end
+    if count + cost > limit then
+        return false, math.max(limit - count, 0), ttl, ttl, nil
+    end
+    return true, limit - count - cost, ttl, 0, nil
+end
+
+local function commit(key, limit, window, now, cost, state)
+    redis.call('INCRBY', key, cost)
+    if redis.call('PTTL', key) < 0 then
+        redis.call('PEXPIRE', key, window)
+    end
+end
+
+local function refund(key, limit, window, now, amount)
+    local count = tonumber(redis.call('GET', key))
+    if count and count > 0 then
+        redis.call('DECRBY', key, math.min(amount, count))
+    end
+end
+"""
+
+# Compact fixed window: windows aligned to the clock, with the counters of
+# many clients packed into one hash per window and bucket. The key passed in
+# is "<prefix>:{<bucket>}:<hex field>"; the hash lives at
+# "<prefix>:{<bucket>}:<window index>" and stores the field in binary, so
+# small buckets stay in Redis' compact listpack encoding. The whole bucket
+# expires at the end of its window; keys never outlive a window.
+COMPACT_FIXED_WINDOW = """
+local function locate(key, window, now)
+    local split = key:match('^.*():')
+    local index = math.floor(now / window)
+    local field = key:sub(split + 1):gsub('..', function(byte) return string.char(tonumber(byte, 16)) end)
+    return key:sub(1, split) .. index, field, index
+end
+
+local function check(key, limit, window, now, cost)
+    local bucket, field, index = locate(key, window, now)
+    local count = tonumber(redis.call('HGET', bucket, field)) or 0
+    local ttl = (index + 1) * window - now
+    if count + cost > limit then
+        return false, math.max(limit - count, 0), ttl, ttl, nil
+    end
+    return true, limit - count - cost, ttl, 0, nil
+end
+
+local function commit(key, limit, window, now, cost, state)
+    local bucket, field, index = locate(key, window, now)
+    redis.call('HINCRBY', bucket, field, cost)
+    if redis.call('PTTL', bucket) < 0 then
+        redis.call('PEXPIREAT', bucket, (index + 1) * window)
+    end
+end
+
+local function refund(key, limit, window, now, amount)
+    local bucket, field = locate(key, window, now)
+    local count = tonumber(redis.call('HGET', bucket, field))
+    if count and count > 0 then
+        redis.call('HINCRBY', bucket, field, -math.min(amount, count))
+    end
+end
+"""
+
+# Sliding-window counter: a hash holding the current window index (w), its
+# count (c) and the previous window's count (p). The previous count is
+# weighted by how much of it still overlaps the sliding window.
+SLIDING_WINDOW = """
+local function check(key, limit, window, now, cost)
+    local index = math.floor(now / window)
+    local state = redis.call('HMGET', key, 'w', 'c', 'p')
+    local current, previous = 0, 0
+    local stored = tonumber(state[1])
+    if stored == index then
+        current, previous = tonumber(state[2]) or 0, tonumber(state[3]) or 0
+    elseif stored == index - 1 then
+        previous = tonumber(state[2]) or 0
+    end
+
+    local elapsed = now - index * window
+    local estimate = previous * (window - elapsed) / window + current
+    if estimate + cost > limit then
+        local retry
+        if current + cost <= limit then
+            -- wait until enough of the previous window has slid out
+            retry = window - (limit - current - cost) * window / previous - elapsed
+        else
+            -- wait for the next window, where today's count becomes the previous one
+            retry = window - elapsed
+            if current > limit - cost then
+                retry = retry + window - (limit - cost) * window / current
+            end
+        end
+        local reset = window - elapsed
+        if current > 0 then
+            reset = reset + window
+        end
+        return false, math.max(math.floor(limit - estimate), 0), reset, math.ceil(retry), nil
+    end
+
+    local reset = 2 * window - elapsed
+    return true, math.max(math.floor(limit - estimate - cost), 0), reset, 0, {index, current + cost, previous}
+end
+
+local function commit(key, limit, window, now, cost, state)
+    redis.call('HSET', key, 'w', state[1], 'c', state[2], 'p', state[3])
+    redis.call('PEXPIRE', key, 2 * window)
+end
+
+local function refund(key, limit, window, now, amount)
+    local state = redis.call('HMGET', key, 'w', 'c')
+    if tonumber(state[1]) == math.floor(now / window) then
+        redis.call('HSET', key, 'c', math.max((tonumber(state[2]) or 0) - amount, 0))
+    end
+end
+"""
+
+# Token bucket: a hash holding the token count (t) and the time it was last
+# refilled (ts). The bucket holds `limit` tokens and refills `limit` tokens
+# per window; a full bucket is indistinguishable from a missing key, so the
+# key expires as soon as it would be full again.
+TOKEN_BUCKET = """
+local function check(key, limit, window, now, cost)
+    local rate = limit / window
+    local state = redis.call('HMGET', key, 't', 'ts')
+    local tokens = tonumber(state[1]) or limit
+    local last = tonumber(state[2]) or now
+    if now > last then
+        tokens = math.min(limit, tokens + (now - last) * rate)
+    end
+
+    if tokens < cost then
+        return false, math.floor(tokens), math.ceil((limit - tokens) / rate), math.ceil((cost - tokens) / rate), nil
+    end
+    tokens = tokens - cost
+    return true, math.floor(tokens), math.ceil((limit - tokens) / rate), 0, tokens
+end
+
+local function commit(key, limit, window, now, cost, state)
+    redis.call('HSET', key, 't', state, 'ts', now)
+    redis.call('PEXPIRE', key, math.max(math.ceil((limit - state) * window / limit), 1))
+end
+
+local function refund(key, limit, window, now, amount)
+    local allowed, remaining, reset, retry, tokens = check(key, limit, window, now, 0)
+    tokens = math.min(limit, tokens + amount)
+    if tokens >= limit then
+        redis.call('DEL', key)
+    else
+        commit(key, limit, window, now, 0, tokens)
+    end
+end
+"""
+
+# Generic cell rate algorithm: a single number, the theoretical arrival time
+# (TAT) of the next request. Requests are spaced `window / limit` apart with
+# a burst tolerance of a full window, i.e. `limit` requests at once.
+GCRA = """
+local function check(key, limit, window, now, cost)
+    local interval = window / limit
+    local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+    local new_tat = tat + interval * cost
+    local allow_at = new_tat - window
+    if now < allow_at then
+        local remaining = math.max(math.floor((window - (tat - now)) / interval), 0)
+        return false, remaining, math.ceil(tat - now), math.ceil(allow_at - now), nil
+    end
+    local remaining = math.floor((window - (new_tat - now)) / interval)
+    return true, remaining, math.ceil(new_tat - now), 0, new_tat
+end
+
+local function commit(key, limit, window, now, cost, state)
+    redis.call('SET', key, state, 'PX', math.max(math.ceil(state - now), 1))
+end
+
+local function refund(key, limit, window, now, amount)
+    local tat = tonumber(redis.call('GET', key))
+    if tat then
+        tat = tat - window / limit * amount
+        if tat <= now then
+            redis.call('DEL', key)
+        else
+            commit(key, limit, window, now, 0, tat)
+        end
+    end
+end
+"""
+
+_DRIVER = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+
+local allowed, remaining, reset, retry, state = check(KEYS[1], limit, window, now, cost)
+if allowed then
+    commit(KEYS[1], limit, window, now, cost, state)
+end
+return {allowed and 1 or 0, remaining, reset, retry}
+"""
+
+_LEASE_DRIVER = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local requested = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+
+local granted = requested
+local allowed, remaining, reset, retry, state = check(KEYS[1], limit, window, now, granted)
+if not allowed then
+    -- a denial reports how much quota is left right now; take all of it
+    granted = math.min(requested, remaining)
+    if granted > 0 then
+        allowed, remaining, reset, retry, state = check(KEYS[1], limit, window, now, granted)
+    end
+end
+if allowed and granted > 0 then
+    commit(KEYS[1], limit, window, now, granted, state)
+else
+    granted = 0
+end
+return {granted, remaining, reset, retry}
+"""
+
+_REFUND_DRIVER = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+refund(KEYS[1], tonumber(ARGV[2]), tonumber(ARGV[3]), now, tonumber(ARGV[1]))
+return 1
+"""
+
+_BATCH_DRIVER = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local replies = {}
+for i, key in ipairs(KEYS) do
+    local count = tonumber(ARGV[3 * i - 2])
+    local limit = tonumber(ARGV[3 * i - 1])
+    local window = tonumber(ARGV[3 * i])
+    for _ = 1, count do
+        local allowed, remaining, reset, retry, state = check(key, limit, window, now, 1)
+        if allowed then
+            commit(key, limit, window, now, 1, state)
+        end
+        replies[#replies + 1] = allowed and 1 or 0
+        replies[#replies + 1] = remaining
+        replies[#replies + 1] = reset
+        replies[#replies + 1] = retry
+    end
+end
+return replies
+"""
+
+_TIERED_DRIVER = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local cost = tonumber(ARGV[1])
+
+local states = {}
+local tier, reply
+local allowed_all = true
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    local allowed, remaining, reset, retry, state = check(KEYS[i], limit, window, now, cost)
+    states[i] = state
+    if not allowed then
+        if allowed_all or retry > reply[4] then
+            tier, reply = i, {0, remaining, reset, retry}
+        end
+        allowed_all = false
+    elseif allowed_all and (tier == nil or remaining < reply[2] or (remaining == reply[2] and reset > reply[3])) then
+        tier, reply = i, {1, remaining, reset, retry}
+    end
+end
+if allowed_all then
+    for i = 1, #KEYS do
+        commit(KEYS[i], tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1]), now, cost, states[i])
+    end
+end
+return {tier, reply[1], reply[2], reply[3], reply[4]}
+"""
+
+# Distributed semaphore for in-flight requests (see ``concurrency.py``).
+# KEYS[1] is a hash of slots held per holder (one holder per worker process),
+# KEYS[2] a sorted set of each holder's lease expiry. Holders whose lease ran
+# out are dropped before counting, so a crashed worker's slots come back
+# after at most one lease TTL. Acquire takes ARGV holder, amount, limit, ttl
+# and replies {granted, in flight}; release takes holder, amount, ttl and
+# replies with the slots the holder still has.
+CONCURRENCY_ACQUIRE = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local slots, expiries, holder = KEYS[1], KEYS[2], ARGV[1]
+local amount, limit, ttl = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+
+for _, stale in ipairs(redis.call('ZRANGEBYSCORE', expiries, '-inf', now)) do
+    redis.call('HDEL', slots, stale)
+end
+redis.call('ZREMRANGEBYSCORE', expiries, '-inf', now)
+
+local in_flight = 0
+for _, count in ipairs(redis.call('HVALS', slots)) do
+    in_flight = in_flight + tonumber(count)
+end
+local granted = math.max(math.min(amount, limit - in_flight), 0)
+if granted > 0 then
+    redis.call('HINCRBY', slots, holder, granted)
+end
+if redis.call('HEXISTS', slots, holder) == 1 then
+    redis.call('ZADD', expiries, now + ttl, holder)
+    local last = tonumber(redis.call('ZRANGE', expiries, -1, -1, 'WITHSCORES')[2])
+    redis.call('PEXPIREAT', slots, last)
+    redis.call('PEXPIREAT', expiries, last)
+end
+return {granted, in_flight + granted}
+"""
+
+CONCURRENCY_RELEASE = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local slots, expiries, holder = KEYS[1], KEYS[2], ARGV[1]
+local count = redis.call('HINCRBY', slots, holder, -tonumber(ARGV[2]))
+if count <= 0 then
+    redis.call('HDEL', slots, holder)
+    redis.call('ZREM', expiries, holder)
+    return 0
+end
+redis.call('ZADD', expiries, now + tonumber(ARGV[3]), holder)
+local last = tonumber(redis.call('ZRANGE', expiries, -1, -1, 'WITHSCORES')[2])
+redis.call('PEXPIREAT', slots, last)
+redis.call('PEXPIREAT', expiries, last)
+return count
+"""
+
+
+def build_script(algorithm_body: str) -> str:
+    """
+    Combines an algorithm's check/commit functions with the shared driver.
+    """
+    return algorithm_body + _DRIVER
+
+
+def build_batch_script(algorithm_body: str) -> str:
+    """
+    Combines an algorithm's check/commit functions with the batch driver.
+    """
+    return algorithm_body + _BATCH_DRIVER
+
+
+def build_lease_script(algorithm_body: str) -> str:
+    """
+    Combines an algorithm's check/commit functions with the lease driver.
+    """
+    return algorithm_body + _LEASE_DRIVER
+
+
+def build_refund_script(algorithm_body: str) -> str:
+    """
+    Combines an algorithm's refund function with the refund driver.
+    """
+    return algorithm_body + _REFUND_DRIVER
+
+
+def build_tiered_script(algorithm_body: str) -> str:
+    """
+    Combines an algorithm's check/commit functions with the tiered driver.
+    """
+    return algorithm_body + _TIERED_DRIVER
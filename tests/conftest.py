@@ -0,0 +1,124 @@
+"""
+Shared fixtures: a settable clock, the backends every algorithm runs on, and
+a small FastAPI app behind the rate limiting middleware.
+"""
+from collections import Counter
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from fastapi_redis_rate_limiter import MemoryBackend, RedisBackend, RedisRateLimitMiddleware
+
+WINDOW_START = 1_699_999_980.0  # a multiple of 60s, so windows line up with the clock
+
+
+class FakeClock:
+    def __init__(self, now: float = WINDOW_START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class CountingBackend(MemoryBackend):
+    """
+    MemoryBackend that counts the calls reaching it, per method.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = Counter()
+
+    async def check(self, *args, **kwargs):
+        self.calls["check"] += 1
+        return await super().check(*args, **kwargs)
+
+    async def acquire_slots(self, *args, **kwargs):
+        self.calls["acquire_slots"] += 1
+        return await super().acquire_slots(*args, **kwargs)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def redis_clock(clock, monkeypatch):
+    # the Redis stand-in answers TIME and computes expiries from time.time()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["redis", "memory"])
+async def backend(request, clock):
+    if request.param == "memory":
+        yield MemoryBackend(clock=clock)
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    request.getfixturevalue("redis_clock")
+    backend = RedisBackend(fakeredis.FakeAsyncRedis())
+    yield backend
+    await backend.close()
+
+
+@pytest.fixture
+def memory_backend(clock):
+    return MemoryBackend(clock=clock)
+
+
+@pytest.fixture
+def counting_backend(clock):
+    return CountingBackend(clock=clock)
+
+
+@pytest.fixture
+def make_app():
+    """
+    Builds an app with ``middleware`` (RedisRateLimitMiddleware by default)
+    configured by ``options``; more routes can be added to it afterwards.
+    """
+    def make_app(middleware=RedisRateLimitMiddleware, **options):
+        app = FastAPI()
+        app.add_middleware(middleware, **options)
+
+        @app.get("/")
+        async def root():
+            return {"message": "Hello World"}
+
+        # Health checks bypass rate limiting
+        @app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        @app.get("/search")
+        async def search():
+            return {}
+
+        @app.get("/static/{name}")
+        async def static(name: str):
+            return {}
+
+        @app.post("/login", name="login")
+        async def login():
+            return {}
+
+        return app
+
+    return make_app
+
+
+@pytest.fixture
+def statuses():
+    """
+    Sends ``count`` requests to ``path`` and returns their status codes.
+    """
+    async def statuses(app, path, count, method="GET"):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            return [(await client.request(method, path)).status_code for _ in range(count)]
+
+    return statuses
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from fastapi_redis_rate_limiter import AIMD, AdaptiveLimiter, Gradient, Policy, RateLimitMetrics
+
+
+def _window(limiter, clock, latency, count=10, errors=0, in_flight=None):
+    """
+    Runs one measurement window of ``count`` requests, ``in_flight`` at a time.
+    """
+    in_flight = in_flight or count
+    for i in range(count):
+        if i % in_flight == 0:
+            for _ in range(min(in_flight, count - i)):
+                assert limiter.try_acquire("critical")
+        if i == count - 1:
+            clock.now += limiter.window
+        limiter.release(latency, i < errors)
+
+
+def test_aimd_backs_off_on_latency_and_probes_only_when_saturated(clock):
+    limiter = AdaptiveLimiter(AIMD(target_latency=0.1, backoff=0.5), initial_limit=10, clock=clock)
+
+    _window(limiter, clock, latency=0.5)
+    assert limiter.limit == 5
+
+    _window(limiter, clock, latency=0.01, count=10, in_flight=5)
+    assert limiter.limit == 6
+
+    # only one request in flight at a time: no reason to raise the limit
+    _window(limiter, clock, latency=0.01, count=10, in_flight=1)
+    assert limiter.limit == 6
+    assert limiter.adjustments == 2
+
+
+def test_error_rate_counts_as_overload(clock):
+    limiter = AdaptiveLimiter("aimd", initial_limit=10, max_error_rate=0.1, clock=clock)
+    _window(limiter, clock, latency=0.01, errors=5)
+    assert limiter.limit == 9
+
+
+def test_gradient_shrinks_the_limit_as_latency_rises(clock):
+    limiter = AdaptiveLimiter(Gradient(smoothing=1.0, baseline_decay=0.0), initial_limit=100, clock=clock)
+    _window(limiter, clock, latency=0.01)
+    assert limiter.limit == 100
+
+    _window(limiter, clock, latency=0.02)
+    assert limiter.limit == pytest.approx(50)
+
+
+def test_limits_stay_within_bounds(clock):
+    limiter = AdaptiveLimiter(AIMD(target_latency=0.1, backoff=0.1), initial_limit=10, min_limit=4, clock=clock)
+    _window(limiter, clock, latency=1.0)
+    assert limiter.limit == 4
+    with pytest.raises(ValueError):
+        AdaptiveLimiter("unknown")
+
+
+def test_low_priority_is_shed_first():
+    limiter = AdaptiveLimiter(initial_limit=10, priorities={"critical": 1.0, "low": 0.5})
+    assert all(limiter.try_acquire("low") for _ in range(5))
+    assert not limiter.try_acquire("low")
+    assert all(limiter.try_acquire("critical") for _ in range(5))
+    assert not limiter.try_acquire("critical")
+    assert limiter.snapshot()["shed"] == {"low": 1, "critical": 1}
+
+
+def test_limit_recovers_from_the_minimum(clock):
+    limiter = AdaptiveLimiter(AIMD(target_latency=0.1, backoff=0.5), initial_limit=4, min_samples=1, clock=clock)
+    while limiter.limit > limiter.min_limit:
+        _window(limiter, clock, latency=0.5, count=1)
+    assert limiter.limit == 1
+
+    clock.now += 3600
+    for _ in range(3):
+        # every class keeps one slot, so the limit can still be measured
+        assert limiter.try_acquire("default")
+        clock.now += limiter.window
+        limiter.release(0.01, False)
+    assert limiter.limit == 3
+
+
+def test_shedding_reevaluates_a_stuck_limit(clock):
+    limiter = AdaptiveLimiter(initial_limit=1, clock=clock)
+    assert limiter.try_acquire("critical")
+    assert not limiter.try_acquire("critical")
+
+    # the request in flight never finishes, so release() never adjusts the limit
+    clock.now += limiter.window
+    assert limiter.try_acquire("critical")
+    assert limiter.limit == 2
+
+
+def test_key_priority_overrides_the_route():
+    limiter = AdaptiveLimiter(key_priority=lambda key: "critical" if key.startswith("10.") else None)
+    assert limiter.priority_of("10.0.0.1", "low") == "critical"
+    assert limiter.priority_of("192.0.2.1", "low") == "low"
+    assert limiter.priority_of("192.0.2.1", "unknown") == "default"
+
+
+async def test_middleware_sheds_with_503_and_exports_metrics(make_app, counting_backend, clock):
+    gate = asyncio.Event()
+    metrics = RateLimitMetrics()
+    adaptive = AdaptiveLimiter(initial_limit=2, min_samples=1, window=0.0, clock=clock)
+    app = make_app(
+        backend=counting_backend,
+        rate_limit=100,
+        policies=[Policy("/reports", priority="low")],
+        adaptive=adaptive,
+        metrics=metrics,
+    )
+
+    @app.get("/slow")
+    async def slow():
+        await gate.wait()
+        return {}
+
+    @app.get("/reports")
+    async def reports():
+        return {}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        running = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.05)
+        shed = await client.get("/reports")
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        # shed before the backend was asked
+        assert counting_backend.calls["check"] == 1
+
+        gate.set()
+        assert (await running).status_code == 200
+        assert (await client.get("/reports")).status_code == 200
+    assert adaptive.in_flight == 0
+
+    text = metrics.render_prometheus()
+    assert 'rate_limit_shed_total{priority="low"} 1' in text
+    assert "rate_limit_adaptive_limit " in text
+    assert metrics.snapshot()["adaptive"]["limit"] == adaptive.limit
+
+
+async def test_rate_limited_requests_give_their_admission_back(make_app, memory_backend, statuses):
+    adaptive = AdaptiveLimiter(initial_limit=1)
+    app = make_app(backend=memory_backend, rate_limit=1, adaptive=adaptive)
+
+    assert await statuses(app, "/", 3) == [200, 429, 429]
+    assert adaptive.in_flight == 0
+    assert adaptive.shed == {}
@@ -0,0 +1,136 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from fastapi_redis_rate_limiter import RedisRateLimitMiddleware, RequestBatcher
+
+
+@pytest.fixture
+def mock_redis():
+    # register_script() is synchronous, the returned script object is awaited
+    client = MagicMock()
+    client.register_script.return_value = AsyncMock()
+    return client
+
+
+def script_reply(mock_redis, reply):
+    mock_redis.register_script.return_value.return_value = reply
+
+
+@pytest.fixture
+def build_app(make_app):
+    def build_app(mock_redis, **options):
+        app = make_app(redis_client=mock_redis, rate_limit=2, time_window=60, **options)
+        _add_streaming_routes(app)
+        return app
+
+    return build_app
+
+
+def _add_streaming_routes(app):
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for part in (b"a", b"b", b"c"):
+                yield part
+        return StreamingResponse(chunks())
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_text("hi")
+        await websocket.close()
+
+
+def test_allowed_request_passes_through(build_app, mock_redis):
+    script_reply(mock_redis, [1, 1, 60000, 0])
+    with TestClient(build_app(mock_redis)) as client:
+        response = client.get("/")
+    assert response.status_code == 200
+    assert response.json() == {"message": "Hello World"}
+
+
+def test_exceeded_request_gets_429_with_retry_after(build_app, mock_redis):
+    script_reply(mock_redis, [0, 0, 41200, 41200])
+    with TestClient(build_app(mock_redis, exceeded_response={"message": "slow down"})) as client:
+        response = client.get("/")
+    assert response.status_code == 429
+    assert response.json() == {"message": "slow down"}
+    assert response.headers["Retry-After"] == "42"
+
+
+def test_redis_failure_returns_503(build_app, mock_redis):
+    mock_redis.register_script.return_value.side_effect = ConnectionError("down")
+    with TestClient(build_app(mock_redis)) as client:
+        response = client.get("/")
+    assert response.status_code == 503
+
+
+def test_health_check_bypassed(build_app, mock_redis):
+    with TestClient(build_app(mock_redis)) as client:
+        response = client.get("/health")
+    assert response.status_code == 200
+    mock_redis.register_script.return_value.assert_not_called()
+
+
+def test_streaming_response_is_untouched(build_app, mock_redis):
+    script_reply(mock_redis, [1, 1, 60000, 0])
+    with TestClient(build_app(mock_redis)) as client:
+        response = client.get("/stream")
+    assert response.status_code == 200
+    assert response.content == b"abc"
+
+
+def test_websocket_passes_through_by_default(build_app, mock_redis):
+    with TestClient(build_app(mock_redis)) as client:
+        with client.websocket_connect("/ws") as websocket:
+            assert websocket.receive_text() == "hi"
+    mock_redis.register_script.return_value.assert_not_called()
+
+
+def test_websocket_handshake_rejected_when_limited(build_app, mock_redis):
+    script_reply(mock_redis, [0, 0, 41200, 41200])
+    with TestClient(build_app(mock_redis, limit_websockets=True)) as client:
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            with client.websocket_connect("/ws"):
+                pass
+    assert exc_info.value.code == 1008
+
+
+def test_denial_costs_a_single_script_call(build_app, mock_redis):
+    script_reply(mock_redis, [0, 0, 41200, 41200])
+    with TestClient(build_app(mock_redis)) as client:
+        client.get("/")
+    mock_redis.register_script.return_value.assert_awaited_once_with(
+        keys=["rate_limit:{testclient}"], args=[1, 2, 60000], client=mock_redis
+    )
+
+
+def test_algorithm_selected_by_name(build_app, mock_redis):
+    script_reply(mock_redis, [1, 1, 60000, 0])
+    app = build_app(mock_redis, algorithm="gcra")
+    with TestClient(app) as client:
+        client.get("/")
+    mock_redis.register_script.return_value.assert_awaited_once_with(
+        keys=["rate_limit:gcra:{testclient}"], args=[1, 2, 60000], client=mock_redis
+    )
+
+
+def test_unknown_algorithm_rejected(mock_redis):
+    with pytest.raises(ValueError):
+        RedisRateLimitMiddleware(FastAPI(), redis_client=mock_redis, algorithm="leaky")
+
+
+def test_checks_go_through_the_batch_script_when_batching(build_app, mock_redis):
+    script_reply(mock_redis, [0, 0, 41200, 41200])
+    batcher = RequestBatcher(max_delay=0)
+    with TestClient(build_app(mock_redis, batcher=batcher)) as client:
+        response = client.get("/")
+    assert response.status_code == 429
+    assert batcher.stats.requests == 1
+    mock_redis.register_script.return_value.assert_awaited_once_with(
+        keys=["rate_limit:{testclient}"], args=[1, 2, 60000], client=mock_redis
+    )
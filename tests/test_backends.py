@@ -0,0 +1,184 @@
+"""
+Algorithm behaviour, run identically against every backend: Redis (through
+the Lua scripts, on an in-memory Redis stand-in) and the in-process
+MemoryBackend (through the Python twins of those scripts).
+"""
+import pytest
+
+from fastapi_redis_rate_limiter import MemoryBackend, RedisBackend
+from fastapi_redis_rate_limiter.algorithms import ALGORITHMS
+
+WINDOW_MS = 60000
+
+
+def limiter(backend, name, limit):
+    algorithm = ALGORITHMS[name]()
+
+    async def hit(client_identifier="client"):
+        return await backend.check(algorithm, algorithm.key(client_identifier), limit, WINDOW_MS)
+
+    return hit
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_allows_up_to_limit_then_denies(backend, name):
+    hit = limiter(backend, name, 3)
+    results = [await hit() for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    assert results[3].retry_after > 0
+    assert 0 < results[3].reset_after <= 2 * WINDOW_MS / 1000
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_denied_client_recovers_after_retry_after(backend, clock, name):
+    hit = limiter(backend, name, 3)
+    for _ in range(3):
+        await hit()
+    denied = await hit()
+    assert not denied.allowed
+    clock.advance(denied.retry_after + 0.001)
+    assert (await hit()).allowed
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_clients_are_independent(backend, name):
+    hit = limiter(backend, name, 1)
+    assert (await hit("a")).allowed
+    assert not (await hit("a")).allowed
+    assert (await hit("b")).allowed
+
+
+async def test_fixed_window_expiry_is_not_extended_by_later_hits(backend, clock):
+    hit = limiter(backend, "fixed_window", 5)
+    await hit()
+    clock.advance(30)
+    result = await hit()
+    assert result.reset_after == pytest.approx(30, abs=0.01)
+
+
+async def test_sliding_window_blocks_burst_across_window_boundary(backend, clock):
+    hit = limiter(backend, "sliding_window", 10)
+    clock.advance(59)
+    assert all([(await hit()).allowed for _ in range(10)])
+    clock.advance(2)  # one second into the next window
+    # a fixed window would hand out 10 fresh requests here
+    assert not (await hit()).allowed
+
+
+async def test_token_bucket_refills_continuously(backend, clock):
+    hit = limiter(backend, "token_bucket", 3)
+    for _ in range(3):
+        await hit()
+    clock.advance(20)  # one third of the window refills one token
+    assert (await hit()).allowed
+    assert not (await hit()).allowed
+
+
+async def test_gcra_spaces_requests_after_burst(backend):
+    hit = limiter(backend, "gcra", 3)
+    for _ in range(3):
+        await hit()
+    denied = await hit()
+    assert denied.retry_after == pytest.approx(20, abs=0.01)
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_batch_matches_sequential_decisions(backend, name):
+    algorithm = ALGORITHMS[name]()
+    items = [(algorithm.key("batch-a"), 3, WINDOW_MS), (algorithm.key("batch-b"), 3, WINDOW_MS)]
+    batched = await backend.check_batch(algorithm, items, [4, 1])
+    decisions = batched[0] + batched[1]
+
+    hit = limiter(backend, name, 3)
+    sequential = [await hit("a") for _ in range(4)] + [await hit("b")]
+    assert [d.allowed for d in decisions] == [s.allowed for s in sequential] == [True, True, True, False, True]
+    assert [d.remaining for d in decisions] == [s.remaining for s in sequential]
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_lease_takes_what_is_left_and_refund_gives_it_back(backend, name):
+    algorithm = ALGORITHMS[name]()
+    key = algorithm.key("client")
+
+    assert (await backend.lease(algorithm, key, 4, 10, WINDOW_MS))[0] == 4
+    assert (await backend.lease(algorithm, key, 4, 10, WINDOW_MS))[0] == 4
+    granted, remaining, _, retry_ms = await backend.lease(algorithm, key, 4, 10, WINDOW_MS)
+    assert (granted, remaining) == (2, 0)
+    granted, _, _, retry_ms = await backend.lease(algorithm, key, 4, 10, WINDOW_MS)
+    assert granted == 0 and retry_ms > 0
+
+    await backend.refund(algorithm, key, 3, 10, WINDOW_MS)
+    assert (await backend.lease(algorithm, key, 4, 10, WINDOW_MS))[0] == 3
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_tiers_commit_together_and_report_the_tightest(backend, clock, name):
+    algorithm = ALGORITHMS[name]()
+    tiers = [(2, 1000), (5, WINDOW_MS)]
+
+    async def hit():
+        return await backend.check_tiers(algorithm, algorithm.key("client"), tiers)
+
+    burst = [await hit() for _ in range(4)]
+    assert [r.allowed for r in burst] == [True, True, False, False]
+    assert (burst[1].limit, burst[1].remaining) == (2, 0)
+    assert burst[2].limit == 2 and 0 < burst[2].retry_after <= 2
+
+    # the denied requests were not counted by the daily-style tier
+    clock.advance(2)
+    assert [(await hit()).allowed for _ in range(2)] == [True, True]
+    clock.advance(2)
+    last = await hit()
+    assert (last.allowed, last.limit, last.remaining) == (True, 5, 0)
+    denied = await hit()
+    assert (denied.allowed, denied.limit) == (False, 5)
+    assert denied.retry_after > 1
+
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+async def test_memory_backend_reclaims_expired_records(clock, name):
+    backend = MemoryBackend(clock=clock)
+    hit = limiter(backend, name, 5)
+    for i in range(1000):
+        await hit(f"client-{i}")
+    assert len(backend) == 1000
+    clock.advance(2 * WINDOW_MS / 1000 + 1)
+    await hit("fresh")
+    assert len(backend) == 1
+
+
+async def test_memory_backend_sweeps_after_long_idle_gap(clock):
+    backend = MemoryBackend(clock=clock)
+    hit = limiter(backend, "fixed_window", 5)
+    for i in range(10):
+        await hit(f"client-{i}")
+    clock.advance(86400 * 30)
+    await hit("fresh")
+    assert len(backend) == 1
+
+
+def test_compact_keys_pack_identifiers():
+    algorithm = ALGORITHMS["compact_fixed_window"](buckets=1)
+    assert algorithm.key("10.0.0.1") == "rate_limit:c:{0}:0a000001"
+    assert algorithm.key("2001:db8::1") == "rate_limit:c:{0}:20010db8000000000000000000000001"
+    assert len(algorithm.key("api-key-123").rsplit(":", 1)[1]) == 16
+    spread = {ALGORITHMS["compact_fixed_window"](buckets=64).key(f"10.0.{i // 256}.{i % 256}").split("}")[0] for i in range(2000)}
+    assert len(spread) == 64
+
+
+async def test_compact_layout_shares_one_expiring_hash_per_bucket(redis_clock):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis()
+    backend = RedisBackend(client)
+    algorithm = ALGORITHMS["compact_fixed_window"](buckets=1)
+    window = int(redis_clock.now * 1000) // WINDOW_MS
+    redis_clock.advance(15)
+    for ip in ("10.0.0.1", "10.0.0.2", "10.0.0.2"):
+        await backend.check(algorithm, algorithm.key(ip), 5, WINDOW_MS)
+
+    bucket = f"rate_limit:c:{{0}}:{window}".encode()
+    assert await client.keys("*") == [bucket]
+    assert await client.hgetall(bucket) == {b"\n\x00\x00\x01": b"1", b"\n\x00\x00\x02": b"2"}
+    assert 44000 <= await client.pttl(bucket) <= 45000
+    await backend.close()
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from fastapi_redis_rate_limiter import RequestBatcher
+
+
+async def test_concurrent_checks_share_one_call_and_identical_items_merge():
+    calls = []
+
+    async def execute(items, counts):
+        calls.append((items, counts))
+        return [[f"{item}-{i}" for i in range(count)] for item, count in zip(items, counts)]
+
+    batcher = RequestBatcher(max_batch_size=100, max_delay=0.01)
+    batcher.bind(execute)
+    replies = await asyncio.gather(*(batcher.submit(item) for item in ["a", "b", "a", "a"]))
+
+    assert calls == [(["a", "b"], [3, 1])]
+    assert replies == ["a-0", "b-0", "a-1", "a-2"]
+    assert batcher.stats.batches == 1
+    assert batcher.stats.requests == 4
+    assert batcher.stats.distinct_items == 2
+    assert 0 <= batcher.stats.mean_queue_delay <= batcher.stats.max_queue_delay
+
+
+async def test_full_batch_is_sent_without_waiting_for_the_timer():
+    sizes = []
+
+    async def execute(items, counts):
+        sizes.append(sum(counts))
+        return [[None] * count for count in counts]
+
+    batcher = RequestBatcher(max_batch_size=2, max_delay=60)
+    batcher.bind(execute)
+    await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=1)
+    assert sizes == [2, 2]
+
+
+async def test_backend_errors_reach_every_waiting_caller():
+    async def execute(items, counts):
+        raise ConnectionError("down")
+
+    batcher = RequestBatcher(max_delay=0)
+    batcher.bind(execute)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+def test_batcher_cannot_serve_two_limiters():
+    async def first(items, counts):
+        pass
+
+    async def second(items, counts):
+        pass
+
+    batcher = RequestBatcher()
+    batcher.bind(first)
+    with pytest.raises(RuntimeError):
+        batcher.bind(second)
@@ -0,0 +1,17 @@
+from benchmarks.bench_hot_path import compare, run_matrix
+
+
+def test_hot_path_report_covers_the_matrix_and_flags_regressions():
+    report = run_matrix(["memory"], ["fixed_window", "gcra"], ["allow", "deny"], [1, 50], [1, 4], requests=200)
+
+    results = report["results"]
+    assert len(results) == 2 * 2 * 2 * 2
+    for result in results:
+        expected = "200" if result["path"] == "allow" else "429"
+        assert result["statuses"] == {expected: 200}
+        assert result["throughput_rps"] > 0
+        assert set(result["latency_us"]) == set(result["added_latency_us"]) == {"p50", "p99", "p999"}
+
+    assert compare(report, report, 0.2) == []
+    faster = {"results": [dict(r, throughput_rps=r["throughput_rps"] * 10) for r in results]}
+    assert len(compare(report, faster, 0.2)) == len(results)
@@ -0,0 +1,108 @@
+import logging
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from fastapi_redis_rate_limiter import CircuitBreaker, CircuitOpenError, FallbackLimiter, RedisRateLimitMiddleware
+
+
+async def failing():
+    raise ConnectionError("down")
+
+
+async def succeeding():
+    return "ok"
+
+
+async def test_breaker_opens_after_threshold_and_short_circuits(clock):
+    breaker = CircuitBreaker(failure_threshold=2, clock=clock)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(failing)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeeding)
+    assert breaker.metrics()["short_circuited"] == 1
+
+
+async def test_half_open_probe_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    clock.now += 5
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)  # failed probe
+    assert breaker.state == "open"
+    clock.now += 5
+    assert await breaker.call(succeeding) == "ok"
+    assert breaker.state == "closed"
+    assert breaker.times_opened == 2
+
+
+def test_half_open_admits_limited_probes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, half_open_max_calls=1, clock=clock)
+    breaker.record_failure()
+    clock.now += 5
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, latency_threshold=0.05)
+    breaker.record_success(0.2)
+    breaker.record_success(0.2)
+    assert breaker.state == "open"
+
+
+def test_fallback_enforces_per_worker_share(clock):
+    limiter = FallbackLimiter(workers=4, clock=clock)
+    results = [limiter.check("k", 10, 60000) for _ in range(3)]
+    assert [r.allowed for r in results] == [True, True, False]
+    assert results[0].limit == 2
+
+
+@pytest.fixture
+def build_app(make_app):
+    def build_app(**options):
+        redis_client = MagicMock()
+        script = redis_client.register_script.return_value = AsyncMock(side_effect=ConnectionError("down"))
+        return make_app(redis_client=redis_client, rate_limit=2, **options), script
+
+    return build_app
+
+
+def test_open_circuit_stops_calling_redis(build_app):
+    app, script = build_app(circuit_breaker=CircuitBreaker(failure_threshold=2))
+    with TestClient(app) as client:
+        statuses = [client.get("/").status_code for _ in range(5)]
+    assert statuses == [503] * 5
+    assert script.await_count == 2
+
+
+def test_fail_open_lets_requests_through(build_app):
+    app, _ = build_app(failure_mode="open")
+    with TestClient(app) as client:
+        assert [client.get("/").status_code for _ in range(3)] == [200, 200, 200]
+
+
+def test_local_failure_mode_uses_fallback_limiter(build_app, caplog):
+    app, _ = build_app(circuit_breaker=CircuitBreaker(failure_threshold=1), failure_mode="local")
+    with caplog.at_level(logging.WARNING, logger="fastapi_redis_rate_limiter.middleware"):
+        with TestClient(app) as client:
+            assert [client.get("/").status_code for _ in range(3)] == [200, 200, 429]
+    assert any("FallbackLimiter(workers=N)" in record.getMessage() for record in caplog.records)
+
+
+def test_explicit_fallback_limiter_splits_the_limit(build_app, caplog):
+    app, _ = build_app(failure_mode="local", fallback=FallbackLimiter(workers=2))
+    with caplog.at_level(logging.WARNING, logger="fastapi_redis_rate_limiter.middleware"):
+        with TestClient(app) as client:
+            assert [client.get("/").status_code for _ in range(2)] == [200, 429]
+    assert not any("FallbackLimiter(workers=N)" in record.getMessage() for record in caplog.records)
+
+
+def test_unknown_failure_mode_rejected():
+    with pytest.raises(ValueError):
+        RedisRateLimitMiddleware(FastAPI(), redis_client=MagicMock(), failure_mode="maybe")
@@ -0,0 +1,80 @@
+import pytest
+
+from fastapi_redis_rate_limiter import ClientIPExtractor
+
+
+def scope(peer, *forwarded):
+    return {
+        "type": "http",
+        "client": (peer, 51000) if peer else None,
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+    }
+
+
+def test_untrusted_peer_cannot_spoof_forwarded_for():
+    extract = ClientIPExtractor()
+    assert extract(scope("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+
+
+def test_only_loopback_proxies_are_trusted_by_default():
+    extract = ClientIPExtractor()
+    assert extract(scope("127.0.0.1", "203.0.113.7")) == "203.0.113.7"
+    assert extract(scope("::1", "203.0.113.7")) == "203.0.113.7"
+    # a neighbour on a private network is a client like any other
+    for peer in ("10.1.2.3", "192.168.1.5", "172.16.0.9", "fd00::1"):
+        assert extract(scope(peer, "203.0.113.7")) == peer
+
+
+def test_chain_is_walked_from_the_right_past_trusted_proxies():
+    extract = ClientIPExtractor(trusted_proxies=["10.0.0.0/8", "198.51.100.0/24"])
+    # spoofed, real client, edge proxy -> internal proxy (peer)
+    assert extract(scope("10.1.2.3", "6.6.6.6, 203.0.113.7, 198.51.100.9")) == "203.0.113.7"
+    # repeated headers are one list
+    assert extract(scope("10.1.2.3", "6.6.6.6, 203.0.113.7", "198.51.100.9")) == "203.0.113.7"
+    # every hop trusted: the leftmost one is the client
+    assert extract(scope("10.1.2.3", "10.9.9.9")) == "10.9.9.9"
+    # garbage written by a trusted hop stops the walk at that hop
+    assert extract(scope("10.1.2.3", "203.0.113.7, bogus")) == "10.1.2.3"
+
+
+def test_forwarded_entries_with_ports_and_mapped_addresses():
+    extract = ClientIPExtractor(trusted_proxies=["127.0.0.0/8"])
+    assert extract(scope("127.0.0.1", "203.0.113.7:4711")) == "203.0.113.7"
+    assert extract(scope("127.0.0.1", "[2001:db8::1]:443")) == "2001:db8::1"
+    assert extract(scope("::ffff:203.0.113.7")) == "203.0.113.7"
+
+
+def test_client_given_as_a_list():
+    extract = ClientIPExtractor()
+    request = {"type": "http", "client": ["203.0.113.7", 51000], "headers": []}
+    assert extract(request) == "203.0.113.7"
+    assert extract(dict(request)) == "203.0.113.7"
+
+
+def test_subnet_aggregation():
+    extract = ClientIPExtractor(ipv4_prefix=24, ipv6_prefix=64)
+    assert extract(scope("203.0.113.7")) == "203.0.113.0/24"
+    assert extract(scope("2001:db8:1:2:aaaa::1")) == extract(scope("2001:db8:1:2:bbbb::2")) == "2001:db8:1:2::/64"
+    with pytest.raises(ValueError):
+        ClientIPExtractor(ipv6_prefix=0)
+
+
+def test_non_ip_peers_and_missing_client():
+    extract = ClientIPExtractor()
+    assert extract(scope("testclient")) == "testclient"
+    assert extract(scope(None)) == "unknown"
+
+
+def test_results_are_cached_per_connection_and_header(monkeypatch):
+    extract = ClientIPExtractor(trusted_proxies=["10.0.0.0/8"], cache_size=2)
+    calls = []
+    original = extract._extract
+    monkeypatch.setattr(extract, "_extract", lambda *args: calls.append(args) or original(*args))
+
+    for _ in range(3):
+        assert extract(scope("10.0.0.1", "203.0.113.7")) == "203.0.113.7"
+    assert extract(scope("10.0.0.1", "203.0.113.8")) == "203.0.113.8"
+    assert len(calls) == 2
+
+    extract(scope("10.0.0.2"))
+    assert len(extract._cache) == 2
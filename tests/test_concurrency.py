@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from fastapi_redis_rate_limiter import ConcurrencyLimitMiddleware, ConcurrencySlots, MemoryBackend
+
+
+async def test_slots_are_shared_and_released(backend):
+    assert await backend.acquire_slots("c:{a}", "w1", 2, 3, 30000) == [2, 2]
+    assert await backend.acquire_slots("c:{a}", "w2", 2, 3, 30000) == [1, 3]
+    assert await backend.acquire_slots("c:{a}", "w2", 1, 3, 30000) == [0, 3]
+    assert await backend.release_slots("c:{a}", "w1", 1, 30000) == 1
+    assert await backend.acquire_slots("c:{a}", "w2", 1, 3, 30000) == [1, 3]
+    assert await backend.acquire_slots("c:{b}", "w2", 1, 3, 30000) == [1, 1]
+
+
+async def test_crashed_holders_slots_come_back_after_the_ttl(backend, clock):
+    assert (await backend.acquire_slots("c:{a}", "crashed", 2, 2, 30000))[0] == 2
+    assert (await backend.acquire_slots("c:{a}", "alive", 1, 2, 30000))[0] == 0
+    clock.now += 31
+    assert await backend.acquire_slots("c:{a}", "alive", 1, 2, 30000) == [1, 1]
+
+
+async def test_idle_slots_are_reused_without_the_backend(counting_backend, clock):
+    slots = ConcurrencySlots(counting_backend, keep_idle=1, clock=clock)
+    for _ in range(3):
+        assert (await slots.acquire("k", 5)).allowed
+        await slots.release("k")
+    assert (counting_backend.calls["acquire_slots"], slots.local_hits) == (1, 2)
+
+    # a lapsed lease is not trusted locally
+    clock.now += 31
+    assert (await slots.acquire("k", 5)).allowed
+    assert counting_backend.calls["acquire_slots"] == 2
+
+
+async def test_release_renews_the_whole_lease(backend, clock):
+    assert await backend.acquire_slots("c:{a}", "w1", 2, 3, 30000) == [2, 2]
+    clock.now += 20
+    assert await backend.release_slots("c:{a}", "w1", 1, 30000) == 1
+    clock.now += 20
+    # w1's remaining slot was renewed by the release and still counts
+    assert await backend.acquire_slots("c:{a}", "w2", 1, 3, 30000) == [1, 2]
+
+
+async def test_release_during_a_denied_acquire_keeps_no_idle_slot(clock):
+    class SlowBackend(MemoryBackend):
+        gate = None
+
+        async def acquire_slots(self, *args):
+            reply = await super().acquire_slots(*args)
+            if self.gate is not None:
+                # the reply is decided, but arrives late
+                await self.gate.wait()
+            return reply
+
+    backend = SlowBackend(clock=clock)
+    slots = ConcurrencySlots(backend, clock=clock)
+    assert (await slots.acquire("k", 1)).allowed
+
+    backend.gate = asyncio.Event()
+    waiting = asyncio.create_task(slots.acquire("k", 1))
+    await asyncio.sleep(0)
+    await slots.release("k")
+    backend.gate.set()
+    assert not (await waiting).allowed
+
+    # the slot went back to the backend, so other workers are not locked out
+    assert await backend.acquire_slots("k", "other", 1, 1, 30000) == [1, 1]
+
+
+@pytest.fixture
+def slow_app(make_app):
+    def slow_app(backend, limit, gate):
+        app = make_app(middleware=ConcurrencyLimitMiddleware, backend=backend, limit=limit)
+
+        @app.get("/slow")
+        async def slow():
+            await gate.wait()
+            return {}
+
+        @app.get("/boom")
+        async def boom():
+            raise RuntimeError("boom")
+
+        return app
+
+    return slow_app
+
+
+async def test_middleware_limits_requests_in_flight(slow_app, backend):
+    gate = asyncio.Event()
+    app = slow_app(backend, 2, gate)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        running = [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        rejected = await client.get("/slow")
+        assert rejected.status_code == 429
+        assert rejected.headers["Retry-After"] == "1"
+
+        gate.set()
+        assert [(await task).status_code for task in running] == [200, 200]
+        assert (await client.get("/slow")).status_code == 200
+
+
+async def test_slot_is_released_when_the_app_fails(slow_app, backend):
+    app = slow_app(backend, 1, asyncio.Event())
+    async with AsyncClient(transport=ASGITransport(app=app, raise_app_exceptions=False), base_url="http://test") as client:
+        for _ in range(3):
+            assert (await client.get("/boom")).status_code == 500
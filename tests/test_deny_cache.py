@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from starlette.testclient import TestClient
+
+from fastapi_redis_rate_limiter import DenyCache, RateLimitResult
+
+
+def denial(retry_after, reset_after=None):
+    return RateLimitResult(False, 5, 0, reset_after or retry_after, retry_after)
+
+
+def test_denial_is_served_until_retry_after(clock):
+    cache = DenyCache(clock=clock)
+    cache.add("k", denial(10))
+    clock.now += 4
+    cached = cache.get("k")
+    assert not cached.allowed
+    assert cached.retry_after == pytest.approx(6)
+    assert cached.reset_after == pytest.approx(6)
+    clock.now += 6
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_entries_are_capped_by_max_ttl(clock):
+    cache = DenyCache(max_ttl=1, clock=clock)
+    cache.add("k", denial(3600))
+    clock.now += 1
+    assert cache.get("k") is None
+
+
+def test_size_is_bounded_by_evicting_oldest_block():
+    cache = DenyCache(max_size=2)
+    for key in ("a", "b", "c"):
+        cache.add(key, denial(60))
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+
+def test_blocked_client_is_answered_without_redis(make_app):
+    redis_client = MagicMock()
+    script = redis_client.register_script.return_value = AsyncMock(return_value=[0, 0, 30000, 30000])
+    app = make_app(redis_client=redis_client, deny_cache=DenyCache())
+
+    with TestClient(app) as client:
+        responses = [client.get("/") for _ in range(3)]
+    assert [r.status_code for r in responses] == [429, 429, 429]
+    assert all(0 < int(r.headers["Retry-After"]) <= 30 for r in responses)
+    assert script.await_count == 1
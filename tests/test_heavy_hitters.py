@@ -0,0 +1,62 @@
+import random
+
+from fastapi_redis_rate_limiter import CountMinSketch, HeavyHitterTracker, TopK
+
+
+def test_sketch_never_undercounts_and_stays_close():
+    sketch = CountMinSketch(width=1024, depth=4)
+    rng = random.Random(7)
+    truth = {}
+    for _ in range(20000):
+        key = f"client-{int(rng.paretovariate(1.2)) % 5000}"
+        truth[key] = truth.get(key, 0) + 1
+        sketch.add(key)
+    errors = [sketch.estimate(key) - count for key, count in truth.items()]
+    assert min(errors) >= 0
+    assert max(errors) <= 20000 / 1024 * 2
+
+
+def test_top_k_keeps_the_heaviest_keys_in_fixed_space():
+    sketch, top = CountMinSketch(), TopK(k=3)
+    stream = ["a"] * 50 + ["b"] * 30 + ["c"] * 20 + [f"spray-{i}" for i in range(5000)]
+    random.Random(1).shuffle(stream)
+    for key in stream:
+        top.offer(key, sketch.add(key))
+    assert [key for key, _ in top.items()] == ["a", "b", "c"]
+    assert len(top.items()) == 3
+
+
+def test_tracker_blocks_past_the_multiple_then_expires(clock):
+    tracker = HeavyHitterTracker(multiple=2, window=60, block_duration=30, clock=clock)
+
+    decisions = [tracker.observe("hot", 5, 60000) for _ in range(12)]
+    assert decisions[:9] == [None] * 9
+    assert all(not d.allowed for d in decisions[9:])
+    assert decisions[9].retry_after == 30
+    assert tracker.observe("cold", 5, 60000) is None
+    assert list(tracker.blocked()) == ["hot"]
+    assert tracker.top_offenders(1) == [("hot", 10)]
+
+    # the block lapses, but the key is still over the threshold in this window
+    clock.now += 31
+    assert not tracker.observe("hot", 5, 60000).allowed
+    clock.now += 60
+    assert tracker.observe("hot", 5, 60000) is None
+    assert tracker.blocked() == {}
+    assert tracker.promotions == 2
+
+
+def test_threshold_scales_with_the_policy_window(clock):
+    tracker = HeavyHitterTracker(multiple=1, window=60, clock=clock)
+    # 1 request per second is 60 per tracker window
+    assert all(tracker.observe("k", 1, 1000) is None for _ in range(59))
+    assert tracker.observe("k", 1, 1000) is not None
+
+
+async def test_blocked_clients_never_reach_the_backend(make_app, counting_backend, statuses):
+    tracker = HeavyHitterTracker(multiple=3)
+    app = make_app(backend=counting_backend, rate_limit=2, heavy_hitters=tracker)
+
+    assert await statuses(app, "/", 20) == [200, 200] + [429] * 18
+    assert counting_backend.calls["check"] == 5
+    assert tracker.blocked_requests == 15
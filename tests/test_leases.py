@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+
+from fastapi_redis_rate_limiter import LeasePool, MemoryBackend, RedisRateLimitMiddleware
+
+
+def test_lease_size_splits_error_budget_across_workers():
+    pool = LeasePool(max_error=0.1, workers=4)
+    assert pool.lease_size(1000) == 25
+    assert pool.applies_to(1000)
+    assert not pool.applies_to(10)
+
+
+def test_granted_lease_is_spent_locally_until_exhausted(clock):
+    pool = LeasePool(max_error=0.1, clock=clock)
+    first = pool.grant("k", [3, 90, 60000, 0], 100, 60000)
+    assert first.allowed and first.remaining == 92
+    assert [pool.take("k").remaining for _ in range(2)] == [91, 90]
+    assert pool.take("k") is None
+    assert pool.local_hits == 2
+
+
+def test_lease_expires_after_max_lease_age(clock):
+    pool = LeasePool(max_lease_age=1.0, clock=clock)
+    pool.grant("k", [5, 50, 60000, 0], 100, 60000)
+    clock.now += 1.0
+    assert pool.take("k") is None
+
+
+def test_lease_never_outlives_backend_reset(clock):
+    pool = LeasePool(max_lease_age=10.0, clock=clock)
+    pool.grant("k", [5, 50, 200, 0], 100, 60000)
+    clock.now += 0.2
+    assert pool.take("k") is None
+
+
+def test_empty_grant_is_a_denial():
+    pool = LeasePool()
+    result = pool.grant("k", [0, 0, 60000, 1500], 100, 60000)
+    assert not result.allowed
+    assert result.retry_after == pytest.approx(1.5)
+
+
+def test_drain_reports_unspent_units(clock):
+    pool = LeasePool(clock=clock)
+    pool.grant("a", [5, 50, 60000, 0], 100, 60000)
+    pool.grant("b", [1, 50, 60000, 0], 100, 60000)
+    assert pool.drain() == [("a", 4, 100, 60000)]
+    assert len(pool) == 0
+
+
+def test_middleware_spends_leases_locally_and_returns_them_on_shutdown():
+    fakeredis = pytest.importorskip("fakeredis")
+    from fastapi import FastAPI
+    from starlette.testclient import TestClient
+
+    from fastapi_redis_rate_limiter import RedisRateLimitMiddleware
+
+    server = fakeredis.FakeServer()
+    pool = LeasePool(max_error=0.1)
+    app = FastAPI()
+    app.add_middleware(
+        RedisRateLimitMiddleware,
+        redis_client=fakeredis.FakeAsyncRedis(server=server),
+        rate_limit=100,
+        leases=pool,
+    )
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    with TestClient(app) as client:
+        assert all(client.get("/").status_code == 200 for _ in range(25))
+        assert pool.leases_granted == 3
+        assert int(fakeredis.FakeRedis(server=server).get("rate_limit:{testclient}")) == 30
+    # lifespan shutdown gave the 5 unspent units back
+    assert int(fakeredis.FakeRedis(server=server).get("rate_limit:{testclient}")) == 25
+
+
+def test_expired_lease_hands_its_unspent_units_back(clock):
+    pool = LeasePool(max_lease_age=1.0, clock=clock)
+    pool.grant("k", [5, 50, 60000, 0], 100, 60000)
+    clock.now += 1.0
+    assert pool.take("k") is None
+    assert pool.drain() == [("k", 4, 100, 60000)]
+
+    pool.grant("k", [5, 50, 60000, 0], 100, 60000)
+    clock.now += 1.0
+    assert pool.take("k") is None
+    assert pool.pop_expired("k") == 4
+    assert pool.pop_expired("k") == 0
+
+
+@pytest.mark.parametrize("algorithm", ["fixed_window", "sliding_window", "token_bucket", "gcra"])
+async def test_steady_traffic_gets_the_whole_allowance(memory_backend, clock, algorithm):
+    middleware = RedisRateLimitMiddleware(
+        FastAPI(),
+        backend=memory_backend,
+        algorithm=algorithm,
+        rate_limit=6000,
+        leases=LeasePool(max_error=0.1, max_lease_age=1.0, clock=clock),
+    )
+    allowed = 0
+    for _ in range(600):
+        allowed += (await middleware.check("10.0.0.1")).allowed
+        clock.advance(0.1)
+    assert allowed == 600
+
+
+async def test_concurrent_requests_share_one_refill(clock):
+    class SlowBackend(MemoryBackend):
+        leases = 0
+
+        async def lease(self, *args):
+            self.leases += 1
+            reply = await super().lease(*args)
+            # the reply is decided, but arrives after the other requests queued up
+            await asyncio.sleep(0.01)
+            return reply
+
+    backend = SlowBackend(clock=clock)
+    middleware = RedisRateLimitMiddleware(
+        FastAPI(),
+        backend=backend,
+        rate_limit=10000,
+        leases=LeasePool(max_error=0.1, clock=clock),
+    )
+    results = await asyncio.gather(*(middleware.check("10.0.0.1") for _ in range(64)))
+    assert all(result.allowed for result in results)
+    assert backend.leases == 1
+
+    # a refill that is denied answers everyone waiting for it
+    other = RedisRateLimitMiddleware(FastAPI(), backend=backend, rate_limit=10000)
+    for _ in range(10000):
+        await other.check("10.0.0.2")
+    results = await asyncio.gather(*(middleware.check("10.0.0.2") for _ in range(64)))
+    assert not any(result.allowed for result in results)
+    assert backend.leases == 2
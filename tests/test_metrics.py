@@ -0,0 +1,125 @@
+import logging
+from contextlib import contextmanager
+
+from httpx import ASGITransport, AsyncClient
+
+from fastapi_redis_rate_limiter import (
+    CircuitBreaker,
+    DenialLog,
+    MemoryBackend,
+    Policy,
+    RateLimitMetrics,
+    prometheus_app,
+)
+
+
+class FailingBackend(MemoryBackend):
+    async def check(self, *args, **kwargs):
+        raise ConnectionError("down")
+
+
+class FakeSpan:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = FakeSpan(name, attributes or {})
+        self.spans.append(span)
+        yield span
+
+
+async def test_decisions_are_counted_per_policy(make_app, memory_backend, statuses):
+    metrics = RateLimitMetrics()
+    app = make_app(backend=memory_backend, rate_limit=2, metrics=metrics, policies=[Policy("/search", rate_limit=1, name="search")])
+
+    await statuses(app, "/", 3)
+    await statuses(app, "/search", 2)
+
+    assert metrics.decisions == {("default", True): 2, ("default", False): 1, ("search", True): 1, ("search", False): 1}
+    assert metrics.snapshot()["backend_latency"]["count"] == 5
+
+
+async def test_errors_and_fallbacks_are_counted(make_app, statuses, clock):
+    metrics = RateLimitMetrics()
+    breaker = CircuitBreaker(failure_threshold=1, clock=clock)
+    app = make_app(backend=FailingBackend(), metrics=metrics, circuit_breaker=breaker, failure_mode="open")
+
+    assert await statuses(app, "/", 3) == [200, 200, 200]
+    assert metrics.errors == {("default", "backend"): 1, ("default", "circuit_open"): 2}
+    assert metrics.fallbacks == {("default", "open"): 3}
+    assert metrics.snapshot()["backend_latency"]["count"] == 0
+
+
+async def test_circuit_breaker_state_is_exported(make_app, statuses, clock):
+    metrics = RateLimitMetrics()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    app = make_app(backend=FailingBackend(), metrics=metrics, circuit_breaker=breaker, failure_mode="open")
+    await statuses(app, "/", 3)
+    lines = metrics.render_prometheus().splitlines()
+    assert 'rate_limit_circuit_state{state="open"} 1' in lines
+    assert 'rate_limit_circuit_state{state="closed"} 0' in lines
+    assert "rate_limit_circuit_opened_total 1" in lines
+    assert "rate_limit_circuit_short_circuited_total 2" in lines
+    assert metrics.snapshot()["circuit"]["state"] == "open"
+
+    clock.now += 5
+    await statuses(app, "/", 1)
+    assert "rate_limit_circuit_opened_total 2" in metrics.render_prometheus().splitlines()
+
+
+async def test_decisions_run_in_spans_when_a_tracer_is_set(make_app, memory_backend, statuses):
+    tracer = FakeTracer()
+    app = make_app(backend=memory_backend, rate_limit=1, metrics=RateLimitMetrics(tracer=tracer))
+
+    await statuses(app, "/", 2)
+
+    assert [span.name for span in tracer.spans] == ["rate_limit.check"] * 2
+    assert [span.attributes["rate_limit.allowed"] for span in tracer.spans] == [True, False]
+    assert tracer.spans[0].attributes["rate_limit.policy"] == "default"
+
+
+async def test_prometheus_exposition():
+    metrics = RateLimitMetrics(buckets=(0.001, 0.01))
+    metrics.record_decision('we"ird', True)
+    metrics.record_error("default", "backend")
+    metrics.observe_backend_latency(0.0005)
+    metrics.observe_backend_latency(0.005)
+    metrics.observe_backend_latency(5)
+
+    async with AsyncClient(transport=ASGITransport(app=prometheus_app(metrics)), base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert 'rate_limit_decisions_total{policy="we\\"ird",decision="allowed"} 1' in lines
+    assert 'rate_limit_errors_total{policy="default",kind="backend"} 1' in lines
+    assert 'rate_limit_backend_latency_seconds_bucket{le="0.001"} 1' in lines
+    assert 'rate_limit_backend_latency_seconds_bucket{le="0.01"} 2' in lines
+    assert 'rate_limit_backend_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "rate_limit_backend_latency_seconds_count 3" in lines
+
+
+def test_denial_log_aggregates_per_interval(caplog, clock):
+    log = DenialLog(interval=10, top=2, max_clients=2, clock=clock)
+    with caplog.at_level(logging.WARNING, logger="fastapi_redis_rate_limiter.metrics"):
+        for client in ["a", "a", "a", "b", "c"] * 100:
+            log.record(client)
+        assert caplog.records == []
+
+        clock.now += 10
+        log.record("a")
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "501 times in the last 10s" in message
+    assert "a (301), b (100)" in message
+    assert "c (" not in message
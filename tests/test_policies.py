@@ -0,0 +1,124 @@
+import pytest
+from fastapi import FastAPI
+
+from fastapi_redis_rate_limiter import Policy, PolicyTable, RedisRateLimitMiddleware
+
+
+def _table(*policies):
+    table = PolicyTable(policies, Policy(path="/*", rate_limit=5, time_window=60, name="default"))
+    table.compile()
+    return table
+
+
+def test_literal_beats_param_beats_wildcard():
+    literal = Policy("/users/me")
+    param = Policy("/users/{user_id}")
+    prefix = Policy("/users/*")
+    table = _table(prefix, param, literal)
+
+    assert table.match("GET", "/users/me") is literal
+    assert table.match("GET", "/users/42") is param
+    assert table.match("GET", "/users/42/orders") is prefix
+    assert table.match("GET", "/users") is prefix
+    assert table.match("GET", "/other") is table.default
+
+
+def test_param_backtracks_to_wildcard():
+    orders = Policy("/users/{user_id}/orders")
+    prefix = Policy("/users/*")
+    table = _table(orders, prefix)
+
+    assert table.match("GET", "/users/1/orders") is orders
+    assert table.match("GET", "/users/1/profile") is prefix
+
+
+def test_exact_method_beats_any_method():
+    writes = Policy("/items", methods=["post", "PUT"], rate_limit=1)
+    reads = Policy("/items", rate_limit=100)
+    table = _table(writes, reads)
+
+    assert table.match("POST", "/items") is writes
+    assert table.match("PUT", "/items/") is writes
+    assert table.match("GET", "/items") is reads
+
+
+def test_unset_settings_inherit_the_default():
+    policy = Policy("/x", rate_limit=2)
+    table = _table(policy)
+    assert (policy.rate_limit, policy.time_window, policy.window_ms) == (2, 60, 60000)
+    assert table.default.window_ms == 60000
+
+
+def test_tiers_are_inherited_unless_a_policy_sets_its_own_limit():
+    default = Policy(path="/*", tiers=[(100, 3600), (5, 1)], name="default")
+    inherited, single, own = Policy("/a"), Policy("/b", rate_limit=1), Policy("/c", tiers=[(1, 10)])
+    table = PolicyTable([inherited, single, own], default)
+    table.compile()
+
+    assert default.tiers_ms == ((5, 1000), (100, 3600000))
+    assert (default.rate_limit, default.time_window) == (5, 1)
+    assert inherited.tiers_ms == default.tiers_ms
+    assert single.tiers_ms is None and single.rate_limit == 1
+    assert own.tiers_ms == ((1, 10000),)
+    with pytest.raises(ValueError):
+        Policy("/d", tiers=[(1, 60), (2, 60)])
+
+
+def test_policy_needs_path_or_route():
+    with pytest.raises(ValueError):
+        Policy()
+    with pytest.raises(ValueError):
+        Policy(path="/a", route="a")
+
+
+def test_route_names_resolve_against_the_app():
+    app = FastAPI()
+
+    @app.post("/orders/{order_id}", name="create_order")
+    async def create_order(order_id: int):
+        return {}
+
+    policy = Policy(route="create_order", rate_limit=1)
+    table = PolicyTable([policy, Policy(route="missing")], Policy(path="/*", rate_limit=5, time_window=60))
+    table.compile(app)
+
+    assert table.match("POST", "/orders/7") is policy
+    assert table.match("GET", "/orders/7") is table.default
+
+
+async def test_exempt_routes_skip_the_backend(make_app, counting_backend, statuses):
+    app = make_app(backend=counting_backend, rate_limit=3, policies=[Policy("/static/*", exempt=True)])
+
+    assert await statuses(app, "/static/app.js", 10) == [200] * 10
+    assert await statuses(app, "/health", 10) == [200] * 10
+    assert counting_backend.calls["check"] == 0
+
+
+async def test_policies_count_and_limit_separately(make_app, memory_backend, statuses):
+    app = make_app(backend=memory_backend, rate_limit=3, policies=[Policy(route="login", rate_limit=1)])
+
+    assert await statuses(app, "/login", 2, method="POST") == [200, 429]
+    # the tight login limit does not eat into the default quota
+    assert await statuses(app, "/", 4) == [200, 200, 200, 429]
+    assert len(memory_backend) == 2
+
+
+async def test_shared_name_shares_one_counter(make_app, memory_backend, statuses):
+    app = make_app(backend=memory_backend, rate_limit=3, policies=[
+        Policy("/", rate_limit=2, name="shared"),
+        Policy("/static/*", rate_limit=2, name="shared"),
+    ])
+
+    assert await statuses(app, "/", 2) == [200, 200]
+    assert await statuses(app, "/static/a", 1) == [429]
+
+
+def test_parameterized_routes_keep_clients_on_their_own_slots(memory_backend):
+    from fastapi_redis_rate_limiter.backends.sharded import hash_tag
+
+    orders = Policy("/orders/{order_id}", rate_limit=1)
+    middleware = RedisRateLimitMiddleware(FastAPI(), backend=memory_backend, policies=[orders])
+    keys = [middleware._key(f"10.0.0.{i}", orders) for i in range(50)]
+
+    assert keys[0] == "rate_limit:{10.0.0.0}:*:/orders/{order_id}"
+    assert [hash_tag(key) for key in keys] == [f"10.0.0.{i}" for i in range(50)]
@@ -0,0 +1,94 @@
+"""
+Sharded backend tests.
+
+Run against independent in-memory nodes by default. To use real servers, start
+several redis-server processes and list them, e.g.
+
+    REDIS_SHARD_URLS=redis://localhost:7001,redis://localhost:7002,redis://localhost:7003 pytest
+"""
+import os
+
+import pytest
+
+from fastapi_redis_rate_limiter import FixedWindow, HashRing, ShardedRedisBackend
+from fastapi_redis_rate_limiter.backends.sharded import hash_tag
+
+
+@pytest.fixture
+async def nodes():
+    urls = os.environ.get("REDIS_SHARD_URLS")
+    if urls:
+        import redis.asyncio as redis
+
+        clients = [redis.from_url(url) for url in urls.split(",")]
+        for client in clients:
+            await client.flushdb()
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        clients = [fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer()) for _ in range(3)]
+    yield clients
+    for client in clients:
+        await client.aclose()
+
+
+def test_hash_tag_follows_cluster_rules():
+    assert hash_tag("rate_limit:{1.2.3.4}") == "1.2.3.4"
+    assert hash_tag("rate_limit:sw:{a}:{b}") == "a"
+    assert hash_tag("rate_limit:{}") == "rate_limit:{}"
+    assert hash_tag("plain") == "plain"
+
+
+def test_ring_spreads_keys_and_moves_few_on_resize():
+    keys = [f"10.0.{i // 256}.{i % 256}" for i in range(6000)]
+    ring = HashRing(["a", "b", "c"])
+    owners = [ring.node_for(key) for key in keys]
+    for node in range(3):
+        assert 0.2 < owners.count(node) / len(keys) < 0.47
+
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = sum(1 for key, owner in zip(keys, owners) if grown.node_for(key) != owner)
+    assert moved / len(keys) < 0.4
+
+
+async def test_keys_of_one_client_live_on_its_ring_node(nodes):
+    backend = ShardedRedisBackend(nodes)
+    algorithm = FixedWindow()
+    for i in range(30):
+        await backend.check(algorithm, algorithm.key(f"client-{i}"), 5, 60000)
+
+    sizes = [await node.dbsize() for node in nodes]
+    assert sum(sizes) == 30
+    assert all(size > 0 for size in sizes)
+    key = algorithm.key("client-7")
+    owner = backend.ring.node_for("client-7")
+    assert [await node.exists(key) for node in nodes] == [int(i == owner) for i in range(len(nodes))]
+
+
+async def test_batch_spanning_nodes_is_split_and_reassembled(nodes):
+    backend = ShardedRedisBackend(nodes)
+    algorithm = FixedWindow()
+    items = [(algorithm.key(f"client-{i}"), 2, 60000) for i in range(12)]
+    results = await backend.check_batch(algorithm, items, [3] * len(items))
+    assert [[r.allowed for r in per_item] for per_item in results] == [[True, True, False]] * len(items)
+    assert sum([await node.dbsize() for node in nodes]) == len(items)
+
+
+async def test_middleware_limits_through_sharded_backend(nodes):
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+
+    from fastapi_redis_rate_limiter import RedisRateLimitMiddleware
+
+    app = FastAPI()
+    app.add_middleware(RedisRateLimitMiddleware, backend=ShardedRedisBackend(nodes), rate_limit=2)
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        statuses = [
+            (await client.get("/", headers={"X-Forwarded-For": ip})).status_code
+            for ip in ("1.1.1.1", "2.2.2.2") for _ in range(3)
+        ]
+    assert statuses == [200, 200, 429, 200, 200, 429]